@@ -0,0 +1,101 @@
+#!/usr/local/bin/python3.11
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional
+
+from cues import CueWorkbook
+from parser import sanitize_filepath, extract_workbook
+
+@dataclass
+class BatchResult():
+    """
+    Result of parsing one workbook of a batch.
+    Exactly one of workbook and error is set.
+    """
+
+    excel_file: str
+    workbook: Optional[CueWorkbook] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        """
+        Converts the result to a JSON-serializable dictionary.
+
+        :return: The "excel_file", its "time_stamps" (see parser.extract_tables) or None, and the "error" or None.
+        """
+        time_stamps = self.workbook.to_dict() if self.workbook is not None else None
+        return {"excel_file": self.excel_file, "time_stamps": time_stamps, "error": self.error}
+
+def extract_file(excel_file: str, reader: str = "pandas") -> BatchResult:
+    """
+    Extracts the time stamp information from one Excel file, catching any error so that it does not affect other files.
+
+    :param excel_file: Excel file path.
+    :param reader: Name of the backend used to read the sheets (see parser.EXCEL_READERS).
+    :return: Result holding either the extracted cue tables or the error message.
+    """
+    try:
+        return BatchResult(excel_file, workbook=extract_workbook(excel_file, reader))
+    except Exception as e:
+        return BatchResult(excel_file, error=f"{type(e).__name__}: {e}")
+
+def extract_isolated(excel_file: str, reader: str = "pandas") -> BatchResult:
+    """
+    Extracts the time stamp information from one Excel file in a worker process of its own,
+    so that if the process dies, no other file is affected.
+
+    :param excel_file: Excel file path.
+    :param reader: Name of the backend used to read the sheets (see parser.EXCEL_READERS).
+    :return: Result holding either the extracted cue tables or the error message.
+    """
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        try:
+            return executor.submit(extract_file, excel_file, reader).result()
+        except BrokenProcessPool as e:
+            return BatchResult(excel_file, error=f"{type(e).__name__}: {e}")
+
+def extract_many(excel_files: Iterable[str], max_workers: Optional[int] = None, reader: str = "pandas") -> Iterator[BatchResult]:
+    """
+    Extracts the time stamp information from many Excel files in parallel using a pool of processes.
+    Results are yielded as soon as each file is parsed, so they do not come in the order the files were given.
+    A file that fails to parse, or whose worker process dies, yields a result with an error instead of stopping the batch.
+
+    :param excel_files: Excel file paths.
+    :param max_workers: Number of worker processes, defaults to the number of CPUs.
+    :param reader: Name of the backend used to read the sheets (see parser.EXCEL_READERS).
+    :return: Iterator over the results of all files, in the order they complete.
+    """
+    unfinished = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(extract_file, excel_file, reader): excel_file
+                   for excel_file in map(sanitize_filepath, excel_files)}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except BrokenProcessPool:
+                # A worker process died and took the whole pool down with it.
+                unfinished.append(futures[future])
+    if not unfinished:
+        return
+
+    # Which file killed the pool is not known, so every file that had not finished is parsed again in a process
+    # of its own, and only a file that kills its own process is marked as failed.
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        futures = [executor.submit(extract_isolated, excel_file, reader) for excel_file in unfinished]
+        for future in as_completed(futures):
+            yield future.result()
+
+if __name__ == "__main__":
+    argument_parser = argparse.ArgumentParser(description="Parses many cue sheets in parallel and prints one JSON line per file.")
+    argument_parser.add_argument("excel_files", nargs="+", help="Excel file paths.")
+    argument_parser.add_argument("--workers", type=int, default=None, help="Number of worker processes.")
+    argument_parser.add_argument("--reader", default="pandas", help="Backend used to read the sheets.")
+    arguments = argument_parser.parse_args()
+
+    for result in extract_many(arguments.excel_files, arguments.workers, arguments.reader):
+        print(json.dumps(result.to_dict()), flush=True)
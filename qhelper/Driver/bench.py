@@ -0,0 +1,124 @@
+#!/usr/local/bin/python3.11
+
+import argparse
+import glob
+import json
+import os
+import tempfile
+import tracemalloc
+from typing import Dict, List, Optional
+
+from parser import EXCEL_READERS, LABEL_MAX_EDIT_DISTANCE, extract_tables
+from profiler import Profile
+
+SAMPLES_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Samples")
+
+# Each workbook is parsed this many times per reader and the fastest run is reported, to reduce noise.
+BENCHMARK_RUNS = 3
+
+def time_stages(excel_file: str, reader: str = "pandas", max_edit_distance: int = LABEL_MAX_EDIT_DISTANCE) -> dict:
+    """
+    Extracts the time stamps from a workbook, timing each stage separately.
+
+    :param excel_file: Excel file path.
+    :param reader: Name of the backend used to read the sheets (see parser.EXCEL_READERS).
+    :param max_edit_distance: Maximum edit distance at which misspelled labels still match.
+    :return: Dictionary with the extracted "time_stamps", the number of "cells" read,
+    and the "seconds" spent on loading the sheets, searching the labels and parsing the times.
+    """
+    profile = Profile()
+    time_stamps = extract_tables(excel_file, reader, max_edit_distance, profile=profile)
+    report = profile.report()
+    return {
+        "time_stamps": time_stamps,
+        "cells": report["counters"].get("cells_scanned", 0),
+        "seconds": {stage_name: report["seconds"].get(stage_name, 0.0)
+                    for stage_name in ("load", "label_search", "time_parsing", "total")},
+    }
+
+def peak_memory(excel_file: str, reader: str = "pandas") -> int:
+    """
+    Measures the peak memory allocated by Python while extracting the time stamps from a workbook.
+
+    :param excel_file: Excel file path.
+    :param reader: Name of the backend used to read the sheets (see parser.EXCEL_READERS).
+    :return: Peak size of the memory blocks traced by tracemalloc in bytes.
+    """
+    tracemalloc.start()
+    try:
+        extract_tables(excel_file, reader)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def benchmark_workbook(excel_file: str, readers: Optional[List[str]] = None, runs: int = BENCHMARK_RUNS,
+                       expected: Optional[dict] = None) -> dict:
+    """
+    Benchmarks extracting the time stamps from a workbook with each reader.
+
+    :param excel_file: Excel file path.
+    :param readers: Names of the readers to benchmark (see parser.EXCEL_READERS), defaults to all of them.
+    :param runs: Number of timed runs per reader, the fastest of which is reported.
+    :param expected: Time stamps the workbook is known to contain, or None to compare every reader to the first one.
+    :return: Report with, for each reader, the number of cells it read, the time spent on each stage,
+    the number of cells processed per second, the peak memory, and whether the extracted time stamps are the expected ones.
+    Readers differ in how many of the empty cells around the data they read, so their cell counts can differ too.
+    """
+    readers = readers or list(EXCEL_READERS)
+    report = {"file": os.path.basename(excel_file), "readers": dict()}
+
+    for reader in readers:
+        stages = min((time_stages(excel_file, reader) for _ in range(runs)), key=lambda stages: stages["seconds"]["total"])
+        if expected is None:
+            expected = stages["time_stamps"]
+        report["readers"][reader] = {
+            "cells": stages["cells"],
+            "seconds": stages["seconds"],
+            "cells_per_second": stages["cells"] / stages["seconds"]["total"] if stages["seconds"]["total"] else None,
+            "peak_memory": peak_memory(excel_file, reader),
+            "matches": stages["time_stamps"] == expected,
+        }
+    return report
+
+def benchmark_corpus(excel_files: Dict[str, Optional[dict]], readers: Optional[List[str]] = None,
+                     runs: int = BENCHMARK_RUNS) -> List[dict]:
+    """
+    Benchmarks every workbook of a corpus.
+
+    :param excel_files: Time stamps each workbook is known to contain keyed by its path, or None where they are not known.
+    :param readers: Names of the readers to benchmark (see parser.EXCEL_READERS), defaults to all of them.
+    :param runs: Number of timed runs per workbook and reader.
+    :return: Report of each workbook (see benchmark_workbook).
+    """
+    return [benchmark_workbook(excel_file, readers, runs, expected) for excel_file, expected in excel_files.items()]
+
+
+if __name__ == "__main__":
+    argument_parser = argparse.ArgumentParser(description="Benchmarks the stages of the parser on the samples and on "
+                                                          "synthetic workbooks, printing a JSON report.")
+    argument_parser.add_argument("excel_files", nargs="*", help="Excel file paths, defaults to the samples.")
+    argument_parser.add_argument("--reader", action="append", dest="readers", help="Reader to benchmark, can be repeated.")
+    argument_parser.add_argument("--runs", type=int, default=BENCHMARK_RUNS, help="Number of runs per workbook and reader.")
+    argument_parser.add_argument("--synthetic", type=int, default=3, help="Number of synthetic workbooks, 0 to skip them.")
+    argument_parser.add_argument("--sheets", type=int, default=3, help="Number of sheets per synthetic workbook.")
+    argument_parser.add_argument("--tables", type=int, default=2, help="Number of cue tables per synthetic sheet.")
+    argument_parser.add_argument("--rows", type=int, default=200, help="Number of cues per synthetic table.")
+    argument_parser.add_argument("--examples", type=int, default=1, help="Number of example forms per synthetic sheet.")
+    argument_parser.add_argument("--junk", type=float, default=0.3, help="Probability of a junk cell next to each synthetic row.")
+    arguments = argument_parser.parse_args()
+
+    excel_files = arguments.excel_files or sorted(glob.glob(os.path.join(SAMPLES_DIRECTORY, "*.xlsx")))
+    report = {"samples": benchmark_corpus(dict.fromkeys(excel_files), arguments.readers, arguments.runs)}
+
+    if arguments.synthetic:
+        from synthetic import generate_corpus
+
+        with tempfile.TemporaryDirectory() as directory:
+            scale = dict(sheets=arguments.sheets, tables=arguments.tables, rows=arguments.rows,
+                         example_blocks=arguments.examples, junk=arguments.junk)
+            corpus = generate_corpus(directory, arguments.synthetic, **scale)
+            # Example forms beside the real forms must only lose their own tables.
+            corpus.update(generate_corpus(os.path.join(directory, "side-by-side"), 1, **scale, side_by_side=True))
+            report["synthetic"] = benchmark_corpus(corpus, arguments.readers, arguments.runs)
+
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,228 @@
+import hashlib
+import json
+import os
+import sys
+import tempfile
+from dataclasses import dataclass
+from typing import Any, Optional
+
+if sys.platform == "darwin":
+    DEFAULT_CACHE_DIRECTORY = os.path.join(os.path.expanduser("~"), "Library", "Caches", "qhelper")
+else:
+    DEFAULT_CACHE_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "qhelper")
+
+# Maximum total size of the cached results in bytes. The least recently used results are evicted past it.
+DEFAULT_CACHE_SIZE = 64 * 1024 * 1024
+
+# File in the cache directory remembering the content hash of each workbook by its path, modification time and size.
+CACHE_INDEX_FILE = "index.json"
+
+CACHE_ENTRY_EXTENSION = ".json"
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+@dataclass
+class ParseCache():
+    """
+    Persistent on-disk cache of parse results keyed by the content hash of the workbook and the parser configuration.
+    Workbooks whose modification time and size did not change since they were last hashed are not hashed again.
+    """
+
+    directory: str = DEFAULT_CACHE_DIRECTORY
+    max_size: int = DEFAULT_CACHE_SIZE
+
+    def get(self, excel_file: str, config: dict) -> Optional[Any]:
+        """
+        Looks up the cached result of parsing the given workbook with the given configuration.
+
+        :param excel_file: Excel file path.
+        :param config: Parser configuration the result depends on.
+        :return: Cached result, or None if the workbook was not parsed with this configuration before
+        or the cache cannot be read.
+        """
+        try:
+            entry_path = self.entry_path(excel_file, config)
+            with open(entry_path, "r") as entry:
+                result = json.load(entry)
+        except (OSError, ValueError):
+            return None
+
+        # The modification time of an entry is when it was last used.
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return result
+
+    def put(self, excel_file: str, config: dict, result: Any) -> None:
+        """
+        Stores the result of parsing the given workbook with the given configuration, evicting old results if needed.
+        Nothing is stored if the cache cannot be written, such as when the disk is full.
+
+        :param excel_file: Excel file path.
+        :param config: Parser configuration the result depends on.
+        :param result: JSON-serializable parse result.
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self.write_atomically(self.entry_path(excel_file, config), json.dumps(result))
+            self.evict()
+        except OSError:
+            pass
+
+    def get_sheets(self, excel_file: str, config: dict) -> Optional[dict]:
+        """
+        Looks up the per-sheet results of the last time the workbook at the given path was parsed with the given configuration.
+
+        :param excel_file: Excel file path.
+        :param config: Parser configuration the results depend on.
+        :return: Dictionary with the "fingerprints" and the "groups" of the sheets keyed by sheet name,
+        or None if the workbook was not parsed with this configuration before.
+        """
+        entry_path = self.sheets_entry_path(excel_file, config)
+        try:
+            with open(entry_path, "r") as entry:
+                sheets = json.load(entry)
+        except (OSError, ValueError):
+            return None
+
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return sheets
+
+    def put_sheets(self, excel_file: str, config: dict, sheets: dict) -> None:
+        """
+        Stores the per-sheet results of parsing the workbook at the given path with the given configuration.
+        Nothing is stored if the cache cannot be written.
+
+        :param excel_file: Excel file path.
+        :param config: Parser configuration the results depend on.
+        :param sheets: Dictionary with the "fingerprints" and the "groups" of the sheets keyed by sheet name.
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self.write_atomically(self.sheets_entry_path(excel_file, config), json.dumps(sheets))
+            self.evict()
+        except OSError:
+            pass
+
+    def clear(self) -> None:
+        """
+        Removes all cached results and the index of workbook hashes.
+        """
+        if not os.path.isdir(self.directory):
+            return
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith(CACHE_ENTRY_EXTENSION):
+                try:
+                    os.remove(os.path.join(self.directory, file_name))
+                except FileNotFoundError:
+                    pass
+
+    def evict(self) -> None:
+        """
+        Removes the least recently used results until the cache fits into max_size.
+        """
+        entries = []
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith(CACHE_ENTRY_EXTENSION) and file_name != CACHE_INDEX_FILE:
+                try:
+                    stat = os.stat(os.path.join(self.directory, file_name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, file_name))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, file_name in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.directory, file_name))
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+    def entry_path(self, excel_file: str, config: dict) -> str:
+        """
+        Returns the path of the cache entry for the given workbook and configuration.
+
+        :param excel_file: Excel file path.
+        :param config: Parser configuration the result depends on.
+        :return: Path of the cache entry.
+        """
+        key = hashlib.blake2b(digest_size=20)
+        key.update(self.content_hash(excel_file).encode("utf-8"))
+        key.update(json.dumps(config, sort_keys=True).encode("utf-8"))
+        return os.path.join(self.directory, key.hexdigest() + CACHE_ENTRY_EXTENSION)
+
+    def sheets_entry_path(self, excel_file: str, config: dict) -> str:
+        """
+        Returns the path of the per-sheet cache entry for the workbook at the given path and configuration.
+        Unlike whole results, per-sheet results are keyed by the path, so that they can be found after the workbook changed.
+
+        :param excel_file: Excel file path.
+        :param config: Parser configuration the results depend on.
+        :return: Path of the cache entry.
+        """
+        key = hashlib.blake2b(digest_size=20)
+        key.update(os.path.abspath(excel_file).encode("utf-8"))
+        key.update(json.dumps(config, sort_keys=True).encode("utf-8"))
+        return os.path.join(self.directory, "sheets-" + key.hexdigest() + CACHE_ENTRY_EXTENSION)
+
+    def content_hash(self, excel_file: str) -> str:
+        """
+        Returns the hash of the contents of the given workbook.
+        The hash is reused without reading the workbook if its modification time and size did not change.
+        If the index of hashes cannot be written, the hash is returned without being remembered.
+
+        :param excel_file: Excel file path.
+        :return: Hex digest of the contents of the workbook.
+        :raises: OSError if the workbook cannot be read.
+        """
+        excel_file = os.path.abspath(excel_file)
+        stat = os.stat(excel_file)
+        index_path = os.path.join(self.directory, CACHE_INDEX_FILE)
+
+        try:
+            with open(index_path, "r") as index_file:
+                index = json.load(index_file)
+        except (OSError, ValueError):
+            index = dict()
+
+        known = index.get(excel_file)
+        if known and known["mtime"] == stat.st_mtime_ns and known["size"] == stat.st_size:
+            return known["hash"]
+
+        content_hash = hashlib.blake2b(digest_size=20)
+        with open(excel_file, "rb") as workbook:
+            for chunk in iter(lambda: workbook.read(HASH_CHUNK_SIZE), b""):
+                content_hash.update(chunk)
+
+        index[excel_file] = {"mtime": stat.st_mtime_ns, "size": stat.st_size, "hash": content_hash.hexdigest()}
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self.write_atomically(index_path, json.dumps(index))
+        except OSError:
+            pass
+        return content_hash.hexdigest()
+
+    def write_atomically(self, path: str, content: str) -> None:
+        """
+        Writes the given content to a file so that concurrent readers never see it half-written.
+
+        :param path: Path of the file.
+        :param content: Content of the file.
+        """
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(file_descriptor, "w") as temp_file:
+                temp_file.write(content)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except FileNotFoundError:
+                pass
+            raise
@@ -1,25 +1,63 @@
-import asyncio
 import json
+from contextlib import contextmanager, nullcontext
 from dataclasses import dataclass
-from typing import Any, Optional
-from pythonosc import udp_client
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, List, Optional, Tuple, Union
+from cues import CueWorkbook
+from profiler import Profile, count, stage
+from transport import TCPTransport
 from utils import *
 
+# pythonosc pulls in asyncio, so it is only imported once a connection is opened.
+if TYPE_CHECKING:
+    from pythonosc import osc_message, udp_client
+
+# Transports Client.start_client can connect to QLab with.
+TRANSPORTS = {"udp", "tcp"}
+
+# Size of the "#bundle" tag and the time tag every OSC bundle starts with.
+BUNDLE_HEADER_SIZE = 16
+
+# Size of the length prefixed to each message of an OSC bundle.
+BUNDLE_ELEMENT_HEADER_SIZE = 4
+
 @dataclass
 class Client():
 
-    client: udp_client.SimpleUDPClient = None
+    client: Union["udp_client.SimpleUDPClient", TCPTransport] = None
+    profile: Optional[Profile] = None
+    max_bundle_size: int = MAX_BUNDLE_SIZE
+    bundle: Optional[List["osc_message.OscMessage"]] = None
 
-    def start_client(self):
+    def start_client(self, transport: str = "udp") -> None:
         """
         Initializes a UDC connection to the server using the DEFAULT_HOST and DEFAULT_PORT
         and sets self.client to SimpleUDPCClient for the opened connection.
         If the connection cannot be established, tries to initialize a UDP connection using PLAIN_TEXT_LISTENING_PORT.
         If both connection attempts are unsuccessful, throws a ConnectionError.
+        With the TCP transport, opens a persistent TCP connection to DEFAULT_LISTENING_PORT instead (see TCPTransport),
+        which does not silently drop messages under load, and sends bundles of up to MAX_TCP_BUNDLE_SIZE bytes.
 
+        :param transport: Transport to connect with, one of TRANSPORTS.
         :mutates: self.client to store the client used for the current connection.
-        :throws: ConnectionError if neither UDP connections to DEFAULT_PORT and PLAIN_TEXT_LISTENING_PORT can be established.
+        :throws: ConnectionError if neither UDP connections to DEFAULT_PORT and PLAIN_TEXT_LISTENING_PORT can be established,
+        or if the TCP connection cannot be established.
+        :throws: ValueError if the transport is unknown.
         """
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Unknown transport: {transport}.")
+        if transport == "tcp":
+            try:
+                self.client = TCPTransport(DEFAULT_HOST, DEFAULT_LISTENING_PORT)
+                self.client.connect()
+            except ConnectionError:
+                print(CONNECTION_FAILURE_MESSAGE.format(port=DEFAULT_LISTENING_PORT))
+                self.client = None
+                raise
+            self.max_bundle_size = MAX_TCP_BUNDLE_SIZE
+            return print(CONNECTION_SUCCESS_MESSAGE.format(host=DEFAULT_HOST, port=DEFAULT_LISTENING_PORT))
+
+        from pythonosc import udp_client
+
         try:
             self.client = udp_client.SimpleUDPClient(DEFAULT_HOST, DEFAULT_LISTENING_PORT)
             return print(CONNECTION_SUCCESS_MESSAGE.format(host=DEFAULT_HOST, port=DEFAULT_LISTENING_PORT))
@@ -37,24 +75,88 @@ class Client():
     def send_command(self, command: str, args: list = []) -> None:
         """
         Sends the given command to QLab for a maximum number of tries of MAX_NUM_TRIES.
+        While batching (see batching), the command is added to the current bundle instead and sent when it is flushed.
 
         :param command: Command to send.
         :param args: Command arguments.
         :raises: UserWarning if this method is called before the connection to QLab is established.
         :raises: ConnectionError if the command cannot be sent after MAX_NUM_TRIES tries.
         """
-        num_tries_left = MAX_NUM_TRIES
-
         if not self.client:
             raise UserWarning(CONNECTION_NOT_ESTABLISHED_WARNING)
+        message = build_message(command, args)
+        if self.bundle is not None:
+            if self.bundle and bundle_size(self.bundle + [message]) > self.max_bundle_size:
+                self.flush()
+            self.bundle.append(message)
+            return
+
+        self.send_with_retries(lambda: self.client.send(message), WRITE_ERROR_MESSAGE.format(command=command, args=args))
+        count(self.profile, "osc_messages")
+
+    @contextmanager
+    def batching(self) -> Iterator[None]:
+        """
+        Batches the commands sent inside the context manager into OSC bundles of at most max_bundle_size bytes,
+        so that many commands cost one datagram instead of one each. QLab runs the commands of a bundle in order,
+        so commands acting on the selected cue still act on the cue created before them.
+        The last bundle is flushed when the context manager exits. If an error is raised inside it,
+        the commands not flushed yet are dropped. Nested calls batch into the outermost bundle.
+
+        :mutates: self.bundle to collect the commands of the current bundle.
+        """
+        if self.bundle is not None:
+            yield
+            return
+
+        self.bundle = []
+        try:
+            yield
+            self.flush()
+        finally:
+            self.bundle = None
+
+    def flush(self) -> None:
+        """
+        Sends the commands batched so far as one OSC bundle, for a maximum number of tries of MAX_NUM_TRIES.
+
+        :raises: ConnectionError if the bundle cannot be sent after MAX_NUM_TRIES tries.
+        """
+        if not self.bundle:
+            return
+
+        from pythonosc import osc_bundle_builder
+
+        messages, self.bundle = self.bundle, []
+        builder = osc_bundle_builder.OscBundleBuilder(osc_bundle_builder.IMMEDIATELY)
+        for message in messages:
+            builder.add_content(message)
+        bundle = builder.build()
+        self.send_with_retries(lambda: self.client.send(bundle),
+                               BUNDLE_WRITE_ERROR_MESSAGE.format(count=len(messages), command=messages[0].address))
+        count(self.profile, "osc_messages", len(messages))
+        count(self.profile, "osc_bundles")
+
+    def send_with_retries(self, send: Callable[[], None], error_message: str) -> None:
+        """
+        Sends a message or a bundle for a maximum number of tries of MAX_NUM_TRIES.
+
+        :param send: Function sending the message or the bundle once.
+        :param error_message: Message of the error raised if every try fails.
+        :raises: ConnectionError if the message or the bundle cannot be sent after MAX_NUM_TRIES tries.
+        """
+        num_tries_left = MAX_NUM_TRIES
         while num_tries_left:
             try:
-                self.client.send_message(command, args)
+                with stage(self.profile, "osc_send"):
+                    send()
                 return
             except:
                 num_tries_left -= 1
+                if num_tries_left:
+                    count(self.profile, "retries")
 
-        raise ConnectionError(WRITE_ERROR_MESSAGE.format(command=command, args=args))
+        raise ConnectionError(error_message)
 
     def connect_to_workspace(self, workspace: str, passcode_string: str = "") -> None:
         """
@@ -70,6 +172,9 @@ class Client():
         method_call = CONNECT_TO_WORKSPACE.format(id=workspace)
         args = [passcode_string]
         self.send_command(method_call, args)
+        if isinstance(self.client, TCPTransport):
+            # QLab ties the pass code to the connection, so it is sent again whenever the connection is reopened.
+            self.client.session_messages = [build_message(method_call, args)]
 
     def disconnect_from_workspace(self) -> None:
         """
@@ -81,6 +186,9 @@ class Client():
         """
         method_call = DISCONNECT
         self.send_command(method_call)
+        if isinstance(self.client, TCPTransport):
+            self.client.session_messages = []
+            self.client.close()
 
     def save_to_disk(self, workspace: str) -> None:
         """
@@ -147,23 +255,87 @@ class Client():
         self.create_cue(workspace, CueType.MIDI)
         self.set_cue_prewait(pre_wait)
 
-    def parse_cue_dict(self, cue_dict: dict, workspace: str) -> None:
+    def parse_cue_dict(self, cue_dict: Union[dict, CueWorkbook], workspace: str, batch: bool = True) -> None:
         """
         Parses the dictionary containing QLab cue information and adds the cues to the given QLab workspace.
         For the dictionary to be parsed properly, the keys must represent group names
         and values must represent subgroups or cue pre-wait times.
 
-        :param cue_dict: Dictionary containing QLab cue information.
+        :param cue_dict: Dictionary containing QLab cue information (see parser.extract_tables), or the same information
+        as a CueWorkbook. Groups may be nested to any depth, and pre-wait times may be numbers of seconds or MM:SS.ms strings.
         :param workspace: Name of the QLab workspace.
+        :param batch: Whether to send the commands in OSC bundles (see batching) rather than one by one.
         :throws: ValueError if the dictionary provided is invalid.
         """
-        for key, value in cue_dict.items():
-            self.create_group(workspace, key)
-            if isinstance(value, dict):
-                self.parse_cue_dict(value, workspace)
-            elif isinstance(value, list):
-                for time_stamp in value:
+        if isinstance(cue_dict, CueWorkbook):
+            tables = ((group_path, table.times) for group_path, table in cue_dict.tables())
+        else:
+            tables = iter_cue_dict(cue_dict)
+        self.push_tables(tables, workspace, batch)
+
+    def push_tables(self, tables: Iterable[Tuple[Tuple[str, ...], Iterable[float]]], workspace: str, batch: bool = True) -> None:
+        """
+        Adds cue tables to the given QLab workspace as they come, creating the groups holding each table.
+
+        :param tables: Names of the groups holding each cue table, outermost first, and its cue pre-wait times,
+        in upload order (see CueWorkbook.tables and parser.iter_tables).
+        :param workspace: Name of the QLab workspace.
+        :param batch: Whether to send the commands in OSC bundles (see batching) rather than one by one.
+        The bundles are flushed after each table, so that a table is not held back while the next one is produced.
+        """
+        with self.batching() if batch else nullcontext():
+            previous_path = ()
+            for group_path, times in tables:
+                # The groups the previous table is in are already created, only the ones it does not share need to be.
+                shared_groups = 0
+                while shared_groups < min(len(group_path), len(previous_path)) and group_path[shared_groups] == previous_path[shared_groups]:
+                    shared_groups += 1
+                for group_name in group_path[shared_groups:]:
+                    self.create_group(workspace, group_name)
+                for time_stamp in times:
                     self.create_midi_cue(workspace, time_stamp)
+                previous_path = group_path
+                if batch:
+                    self.flush()
+
+def iter_cue_dict(cue_dict: dict, group_path: Tuple[str, ...] = ()) -> Iterator[Tuple[Tuple[str, ...], list]]:
+    """
+    Walks a dictionary containing QLab cue information depth first, the way Client.parse_cue_dict adds it to QLab.
+
+    :param cue_dict: Dictionary whose keys are group names and whose values are subgroups or cue pre-wait times.
+    :param group_path: Names of the groups holding the dictionary, outermost first.
+    :return: Iterator over the names of the groups holding each list of pre-wait times, outermost first, and the list.
+    Groups holding no pre-wait times are yielded with an empty list, so that they are still created.
+    """
+    for group_name, value in cue_dict.items():
+        if isinstance(value, dict) and value:
+            yield from iter_cue_dict(value, (*group_path, group_name))
+        else:
+            yield (*group_path, group_name), value if isinstance(value, list) else []
+
+def build_message(command: str, args: list) -> "osc_message.OscMessage":
+    """
+    Builds an OSC message the way SimpleUDPClient.send_message does, inferring the type of each argument.
+
+    :param command: Command of the message.
+    :param args: Command arguments.
+    :return: OSC message.
+    """
+    from pythonosc.osc_message_builder import OscMessageBuilder
+
+    builder = OscMessageBuilder(address=command)
+    for arg in args:
+        builder.add_arg(arg)
+    return builder.build()
+
+def bundle_size(messages: List["osc_message.OscMessage"]) -> int:
+    """
+    Computes the size of the OSC bundle holding the given messages.
+
+    :param messages: Messages of the bundle.
+    :return: Size of the bundle datagram in bytes.
+    """
+    return BUNDLE_HEADER_SIZE + sum(BUNDLE_ELEMENT_HEADER_SIZE + message.size for message in messages)
 
 def serialize(message: Any) -> bytes:
     """
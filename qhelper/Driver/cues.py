@@ -0,0 +1,118 @@
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+@dataclass(slots=True)
+class CueTable():
+    """
+    Cue times of one cue table, stored as a compact array of seconds.
+    """
+
+    name: Optional[str] = None
+    times: array = field(default_factory=lambda: array("d"))
+    time_format: Optional[str] = None
+
+@dataclass(slots=True)
+class CueSheet():
+    """
+    Cue tables of one sheet, in the order they appear in it.
+    The only cue table of a sheet has no name, the cue tables of a sheet with several are named "Part N".
+    """
+
+    name: str
+    tables: List[CueTable] = field(default_factory=list)
+
+    def to_value(self) -> Union[List[float], Dict[str, List[float]]]:
+        """
+        Converts the sheet to the value extract_tables returns for it.
+
+        :return: Times of the only cue table of the sheet, or times of each cue table keyed by its name.
+        """
+        if len(self.tables) == 1 and self.tables[0].name is None:
+            return self.tables[0].times.tolist()
+        return {table.name: table.times.tolist() for table in self.tables}
+
+@dataclass(slots=True)
+class CueWorkbook():
+    """
+    Cue times extracted from one workbook, in the order they are uploaded to QLab.
+    Takes a fraction of the memory of the dictionaries extract_tables returns, since every time is a plain double.
+    """
+
+    name: Optional[str] = None
+    sheets: List[CueSheet] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, time_stamps: dict, time_formats: Optional[dict] = None, name: Optional[str] = None) -> "CueWorkbook":
+        """
+        Builds the workbook from the dictionary extract_tables returns.
+
+        :param time_stamps: Times of each cue table of each sheet (see extract_tables).
+        :param time_formats: Time formats of the cue tables grouped the same way (see parser.infer_time_format),
+        or None if not known.
+        :param name: Name of the workbook, such as its file name.
+        :return: Workbook holding the same cue tables.
+        :raises: ValueError if the dictionary is not shaped like the results of extract_tables.
+        """
+        time_formats = time_formats or dict()
+        workbook = cls(name)
+        for sheet_name, cue_group in time_stamps.items():
+            format_group = time_formats.get(sheet_name)
+            if isinstance(cue_group, dict):
+                format_group = format_group if isinstance(format_group, dict) else dict()
+                tables = [cue_table(times, table_name, format_group.get(table_name)) for table_name, times in cue_group.items()]
+            else:
+                tables = [cue_table(cue_group, None, format_group if isinstance(format_group, str) else None)]
+            workbook.sheets.append(CueSheet(sheet_name, tables))
+        return workbook
+
+    def to_dict(self) -> dict:
+        """
+        Converts the workbook to the dictionary extract_tables returns.
+
+        :return: Times of each cue table of each sheet.
+        """
+        return {sheet.name: sheet.to_value() for sheet in self.sheets}
+
+    def tables(self) -> Iterator[Tuple[Tuple[str, ...], CueTable]]:
+        """
+        Iterates over the cue tables of all sheets in upload order.
+
+        :return: Iterator over the names of the groups holding each cue table, outermost first, and the cue table.
+        """
+        for sheet in self.sheets:
+            for table in sheet.tables:
+                yield (sheet.name,) if table.name is None else (sheet.name, table.name), table
+
+    def cues(self) -> Iterator[Tuple[Tuple[str, ...], int, float]]:
+        """
+        Iterates over the cues of all sheets in upload order.
+
+        :return: Iterator over the names of the groups holding each cue, the index of the cue in its table, and its time.
+        """
+        for group_path, table in self.tables():
+            for cue_index, seconds in enumerate(table.times):
+                yield group_path, cue_index, seconds
+
+    def cue_count(self) -> int:
+        """
+        Counts the cues of all sheets.
+
+        :return: Number of cues.
+        """
+        return sum(len(table.times) for sheet in self.sheets for table in sheet.tables)
+
+def cue_table(times: Iterable[float], name: Optional[str] = None, time_format: Optional[str] = None) -> CueTable:
+    """
+    Builds a cue table from a list of times.
+
+    :param times: Cue times in seconds.
+    :param name: Name of the table, or None if it is the only one of its sheet.
+    :param time_format: Time format of the table (see parser.infer_time_format), or None if not known.
+    :return: Cue table.
+    :raises: ValueError if the times are not a list of numbers.
+    """
+    try:
+        return CueTable(name, array("d", times), time_format)
+    except TypeError:
+        raise ValueError(f"Cue times must be a list of numbers, got {times!r}.")
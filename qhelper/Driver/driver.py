@@ -2,8 +2,19 @@
 
 from client import *
 from utils import *
-from parser import sanitize_filepath, extract_tables
+from cache import ParseCache
+from parser import sanitize_filepath, extract_tables, extract_changed_tables, iter_tables
+from profiler import Profile, stage, timed
+from typing import Iterable, Iterator, Optional, TypeVar
+import argparse
+import queue
 import sys
+import threading
+
+T = TypeVar("T")
+
+# Number of parsed cue tables that can wait to be written to QLab while the following ones are parsed.
+PIPELINE_QUEUE_SIZE = 4
 
 def prompt_workspace_name() -> str:
     """
@@ -27,25 +38,158 @@ def prompt_workspace_passcode() -> str:
     workspace_passcode = input()
     return workspace_passcode.strip()
 
-def main(filepath: str) -> None:
-    try:
-        filepath = sanitize_filepath(filepath)
-        cue_dict = extract_tables(filepath)
-        workspace_name = prompt_workspace_name()
-        workspace_passcode = prompt_workspace_passcode()
-        client = Client()
-        client.start_client()
+def push_cues(cue_dict: dict, workspace_name: str, workspace_passcode: str = "", profile: Optional[Profile] = None,
+              transport: str = "udp") -> None:
+    """
+    Writes the given cues to a QLab workspace and saves it.
+
+    :param cue_dict: Dictionary containing QLab cue information (see parser.extract_tables).
+    :param workspace_name: Name of the QLab workspace.
+    :param workspace_passcode: Pass code for the QLab workspace, empty if it has none.
+    :param profile: Profile to record the time spent on each stage and the work done in, or None to not profile.
+    :param transport: Transport to connect to QLab with (see client.TRANSPORTS).
+    :raises: ConnectionError if QLab cannot be reached.
+    """
+    # Time spent in the client outside of sending messages, such as building them.
+    with stage(profile, "push"):
+        client = Client(profile=profile)
+        client.start_client(transport)
         client.connect_to_workspace(workspace_name, workspace_passcode)
         client.parse_cue_dict(cue_dict, workspace_name)
         client.save_to_disk(workspace_name)
         client.disconnect_from_workspace()
+
+def prefetch(items: Iterable[T], max_size: int = PIPELINE_QUEUE_SIZE) -> Iterator[T]:
+    """
+    Produces the items of an iterable in a background thread, at most max_size items ahead of the consumer,
+    so that producing the next items overlaps with consuming the previous ones.
+
+    :param items: Iterable to produce the items of.
+    :param max_size: Maximum number of items produced but not consumed yet.
+    :return: Iterator over the same items. Errors raised while producing them are raised by the iterator.
+    """
+    buffer = queue.Queue(maxsize=max_size)
+    stopped = threading.Event()
+
+    def put(entry: tuple) -> bool:
+        # Gives up once the consumer stopped, instead of waiting forever for room in the buffer.
+        while not stopped.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce() -> None:
+        try:
+            for item in items:
+                if not put((False, item)):
+                    return
+            put((True, None))
+        except Exception as e:
+            put((True, e))
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            finished, value = buffer.get()
+            if finished:
+                if value is not None:
+                    raise value
+                return
+            yield value
+    finally:
+        stopped.set()
+
+def stream_cues(filepath: str, workspace_name: str, workspace_passcode: str = "", reader: str = "pandas",
+                profile: Optional[Profile] = None, transport: str = "udp") -> None:
+    """
+    Parses a cue sheet and writes its cues to a QLab workspace at the same time: the cue tables are parsed in a
+    background thread and each one is written as soon as it is parsed, so the whole run takes about as long as the
+    slower of the two instead of both added up. The cache is not used.
+
+    :param filepath: Excel file path.
+    :param workspace_name: Name of the QLab workspace.
+    :param workspace_passcode: Pass code for the QLab workspace, empty if it has none.
+    :param reader: Name of the backend used to read the sheets (see parser.EXCEL_READERS).
+    :param profile: Profile to record the time spent on each stage and the work done in, or None to not profile.
+    The parsing stages overlap with the push, and the time the push waits for the next table is recorded as "parse_wait".
+    :param transport: Transport to connect to QLab with (see client.TRANSPORTS).
+    :raises: ConnectionError if QLab cannot be reached.
+    """
+    # Profiles are not thread-safe, so parsing is profiled separately and added to the profile once it is done.
+    parse_profile = Profile() if profile is not None else None
+    tables = prefetch(iter_tables(filepath, reader, profile=parse_profile))
+    with stage(profile, "push"):
+        client = Client(profile=profile)
+        client.start_client(transport)
+        client.connect_to_workspace(workspace_name, workspace_passcode)
+        client.push_tables(timed(profile, tables, "parse_wait"), workspace_name)
+        client.save_to_disk(workspace_name)
+        client.disconnect_from_workspace()
+    if profile is not None:
+        profile.merge(parse_profile)
+
+def main(filepath: str, use_cache: bool = True, changed_only: bool = False, profile: Optional[Profile] = None,
+         stream: bool = False, transport: str = "udp") -> Optional[dict]:
+    """
+    Parses a cue sheet and writes its cues to a QLab workspace.
+
+    :param filepath: Excel file path.
+    :param use_cache: Whether to reuse and store parse results in the cache.
+    :param changed_only: Whether to only write the groups whose cues changed since the file was last parsed.
+    :param profile: Profile to record the time spent on each stage and the work done in, or None to not profile.
+    The time spent waiting for the user to enter the workspace name and pass code is not recorded.
+    :param stream: Whether to write the cues while the file is still being parsed (see stream_cues).
+    The workspace is then asked for before parsing, and use_cache and changed_only are ignored.
+    :param transport: Transport to connect to QLab with (see client.TRANSPORTS).
+    :return: Report of the profile (see Profile.report), or None if not profiling.
+    """
+    try:
+        filepath = sanitize_filepath(filepath)
+        if stream:
+            workspace_name = prompt_workspace_name()
+            workspace_passcode = prompt_workspace_passcode()
+            stream_cues(filepath, workspace_name, workspace_passcode, profile=profile, transport=transport)
+        else:
+            if use_cache:
+                cue_dict, changed_groups = extract_changed_tables(filepath, ParseCache(), profile=profile)
+                print(CHANGED_GROUPS_MESSAGE.format(groups=", ".join(changed_groups) or "none"))
+                if changed_only:
+                    cue_dict = {group_name: cue_dict[group_name] for group_name in changed_groups}
+            else:
+                cue_dict = extract_tables(filepath, profile=profile)
+            workspace_name = prompt_workspace_name()
+            workspace_passcode = prompt_workspace_passcode()
+            push_cues(cue_dict, workspace_name, workspace_passcode, profile, transport)
         print(EXIT_SUCCESS_MESSAGE)
     except Exception as e:
         print(EXIT_FAILURE_MESSAGE)
         print(f"Error message: {e}")
+    return profile.report() if profile is not None else None
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
+    argument_parser = argparse.ArgumentParser(description="Parses a cue sheet and writes its cues to a QLab workspace.")
+    argument_parser.add_argument("filepath", nargs="?", help="Excel file path.")
+    argument_parser.add_argument("--no-cache", action="store_true", help="Parse the file even if its result is cached.")
+    argument_parser.add_argument("--clear-cache", action="store_true", help="Remove all cached parse results.")
+    argument_parser.add_argument("--changed-only", action="store_true",
+                                 help="Only write the groups whose cues changed since the file was last parsed.")
+    argument_parser.add_argument("--profile", action="store_true",
+                                 help="Print the time spent on each stage and counters of the work done as JSON.")
+    argument_parser.add_argument("--stream", action="store_true",
+                                 help="Write the cues while the file is still being parsed, without using the cache.")
+    argument_parser.add_argument("--tcp", action="store_true",
+                                 help="Write the cues over one persistent TCP connection instead of UDP.")
+    arguments = argument_parser.parse_args()
+
+    if arguments.clear_cache:
+        ParseCache().clear()
+    if arguments.filepath:
+        json.dump(main(arguments.filepath, not arguments.no_cache, arguments.changed_only,
+                       Profile() if arguments.profile else None, arguments.stream, "tcp" if arguments.tcp else "udp"),
+                  sys.stdout, indent=4)
+    elif not arguments.clear_cache:
         raise Exception("Please provide an excel file path.")
-    json.dump(main(sys.argv[1]), sys.stdout, indent=4)
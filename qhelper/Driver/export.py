@@ -0,0 +1,143 @@
+#!/usr/local/bin/python3.11
+
+import argparse
+import json
+import os
+import sys
+from array import array
+from dataclasses import dataclass, field
+from itertools import repeat
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+from cues import CueSheet, CueTable, CueWorkbook
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Columns of an export, with the array type code of their values. The workbook, sheet and part columns hold indices
+# into the names stored next to the columns, so that each name is stored once.
+CUE_COLUMNS = {"workbook": "i", "sheet": "i", "part": "i", "cue_index": "i", "seconds": "d"}
+
+# Part index of the cues of the only cue table of a sheet, which has no part name.
+NO_PART = -1
+
+# File the workbook, sheet and part names of an export are stored in, with the cue tables of each workbook.
+NAMES_FILE = "names.json"
+
+@dataclass
+class CueColumns():
+    """
+    Cues of many workbooks as one row per cue, loaded from an export.
+    The columns are memory-mapped NumPy arrays, so loading an export reads nothing until the columns are used.
+    The sheets of each workbook are listed in upload order with their sheet index and their cue tables,
+    each as its part index and its number of cues, so that sheets and cue tables without any cues are kept.
+    """
+
+    columns: Dict[str, "np.ndarray"] = field(default_factory=dict)
+    workbooks: List[Optional[str]] = field(default_factory=list)
+    sheets: List[str] = field(default_factory=list)
+    parts: List[str] = field(default_factory=list)
+    tables: List[List[Tuple[int, List[Tuple[int, int]]]]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.columns["seconds"])
+
+    def to_workbooks(self) -> List[CueWorkbook]:
+        """
+        Rebuilds the workbooks the cues were exported from, copying their times out of the columns.
+
+        :return: Workbooks in the order they were exported.
+        """
+        seconds = self.columns["seconds"]
+        workbooks = [CueWorkbook(name) for name in self.workbooks]
+        # Rows are in upload order, so each cue table is the run of rows following the cue tables before it.
+        start = 0
+        for workbook, sheet_tables in zip(workbooks, self.tables):
+            for sheet_code, tables in sheet_tables:
+                sheet = CueSheet(self.sheets[sheet_code])
+                for part_code, cues in tables:
+                    part_name = None if part_code == NO_PART else self.parts[part_code]
+                    sheet.tables.append(CueTable(part_name, array("d", seconds[start:start + cues])))
+                    start += cues
+                workbook.sheets.append(sheet)
+        return workbooks
+
+def export_cues(workbooks: Iterable[CueWorkbook], directory: str) -> int:
+    """
+    Writes the cues of many workbooks to a directory as one NumPy array per column (see CUE_COLUMNS) and their names,
+    so that tools aggregating cues across a season can load all of them at once instead of parsing every workbook.
+
+    :param workbooks: Workbooks to export.
+    :param directory: Directory to write the export to, created if missing.
+    :return: Number of cues exported.
+    """
+    import numpy as np
+
+    columns = {name: array(type_code) for name, type_code in CUE_COLUMNS.items()}
+    workbook_names = []
+    workbook_tables = []
+    sheet_codes = dict()
+    part_codes = dict()
+
+    for workbook_code, workbook in enumerate(workbooks):
+        workbook_names.append(workbook.name)
+        sheet_tables = []
+        for sheet in workbook.sheets:
+            sheet_code = sheet_codes.setdefault(sheet.name, len(sheet_codes))
+            tables = []
+            for table in sheet.tables:
+                part_code = NO_PART if table.name is None else part_codes.setdefault(table.name, len(part_codes))
+                cues = len(table.times)
+                tables.append((part_code, cues))
+                columns["workbook"].extend(repeat(workbook_code, cues))
+                columns["sheet"].extend(repeat(sheet_code, cues))
+                columns["part"].extend(repeat(part_code, cues))
+                columns["cue_index"].extend(range(cues))
+                columns["seconds"].extend(table.times)
+            sheet_tables.append((sheet_code, tables))
+        workbook_tables.append(sheet_tables)
+
+    os.makedirs(directory, exist_ok=True)
+    for name, values in columns.items():
+        np.save(os.path.join(directory, f"{name}.npy"), np.frombuffer(values, dtype=values.typecode))
+    with open(os.path.join(directory, NAMES_FILE), "w") as names_file:
+        json.dump({"workbooks": workbook_names, "sheets": list(sheet_codes), "parts": list(part_codes),
+                   "tables": workbook_tables}, names_file)
+    return len(columns["seconds"])
+
+def load_cues(directory: str) -> CueColumns:
+    """
+    Loads an export written by export_cues without copying its columns into memory.
+
+    :param directory: Directory of the export.
+    :return: Memory-mapped columns of the export and their names.
+    :raises: FileNotFoundError if the directory does not hold an export.
+    """
+    import numpy as np
+
+    with open(os.path.join(directory, NAMES_FILE)) as names_file:
+        names = json.load(names_file)
+    columns = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in CUE_COLUMNS}
+    return CueColumns(columns, names["workbooks"], names["sheets"], names["parts"], names["tables"])
+
+
+if __name__ == "__main__":
+    from batch import extract_many
+    from parser import sanitize_filepath
+
+    argument_parser = argparse.ArgumentParser(description="Parses many cue sheets in parallel and exports their cues "
+                                                          "as columns to a directory.")
+    argument_parser.add_argument("directory", help="Directory to write the export to.")
+    argument_parser.add_argument("excel_files", nargs="+", help="Excel file paths.")
+    argument_parser.add_argument("--workers", type=int, default=None, help="Number of worker processes.")
+    argument_parser.add_argument("--reader", default="pandas", help="Backend used to read the sheets.")
+    arguments = argument_parser.parse_args()
+
+    results = {result.excel_file: result for result in extract_many(arguments.excel_files, arguments.workers, arguments.reader)}
+    for result in results.values():
+        if result.error is not None:
+            print(f"{result.excel_file}: {result.error}", file=sys.stderr)
+    # Results come in the order the files finish, so they are put back in the order the files were given.
+    workbooks = [results[excel_file].workbook for excel_file in map(sanitize_filepath, arguments.excel_files)
+                 if results[excel_file].error is None]
+    print(export_cues(workbooks, arguments.directory))
@@ -1,61 +1,409 @@
-import csv
 import datetime
-import json
 import math
 import os
 import re
-import sys
-from audioop import reverse
-from copy import deepcopy
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import repeat
 
-from dateutil.parser import parse, ParserError
+from typing import TYPE_CHECKING, Any, Collection, Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
 
-import pandas as pd
+from cache import ParseCache
+from cues import CueSheet, CueTable, CueWorkbook
+from profiler import Profile, count, stage, timed
+from xlsx import SharedString, SharedStrings, sheet_fingerprints, stream_xlsx_sheets
 
-from typing import Tuple, List, Optional
+# pandas, NumPy, openpyxl and dateutil take most of the start-up time, so they are only imported by the functions using them.
+if TYPE_CHECKING:
+    import numpy as np
+
+# Version of the parsing logic. Must be bumped whenever a change to the parser changes its results, to invalidate cached results.
+PARSER_VERSION = 7
 
-#CUE_TIME_REGEX = r"^([0-5]?[0-9]):[0-5][0-9].?[0-9]?[0-9]?$"
-CUE_TIME_FORMAT = "%M:%S"
 CUE_TIME_FORMAT_MS = "%M:%S.%f"
-CUE_TIME_FORMAT_HOURS = "%H:%M:%S"
-CUE_TIME_FORMAT_HOURS_DECIMAl = "%H:%M.%f"
-CUE_TIME_FORMAT_COLONS = "%H:%M:%S:%f"
+
+# Picks the format of a sanitized time cell in one match: MM:SS, MM:SS.ff, HH:MM:SS, HH:MM:SS:ff or a number of seconds.
+TIME_CELL_PATTERN = re.compile(
+    r"(?P<minutes>[0-5]?[0-9]):(?P<seconds>[0-5]?[0-9])(?:\.(?P<fraction>[0-9]{1,6}))?"
+    r"|(?P<hours>2[0-3]|[01]?[0-9]):(?P<clock_minutes>[0-5]?[0-9]):(?P<clock_seconds>[0-5]?[0-9])"
+    r"(?::(?P<clock_fraction>[0-9]{1,6}))?"
+    r"|(?P<number>[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?)")
+
+# Formats a text time cell of a cue table is usually written in, with the pattern matching its sanitized text.
+# Every cell of a table is almost always written in the same format, so the format of a time column is inferred
+# from its first cells and the rest of the column is matched against that pattern only.
+TIME_FORMATS = {
+    "MM:SS": re.compile(r"(?P<minutes>[0-5]?[0-9]):(?P<seconds>[0-5]?[0-9])"),
+    "MM:SS.ff": re.compile(r"(?P<minutes>[0-5]?[0-9]):(?P<seconds>[0-5]?[0-9])\.(?P<fraction>[0-9]{1,6})"),
+    "HH:MM:SS": re.compile(r"(?P<hours>2[0-3]|[01]?[0-9]):(?P<clock_minutes>[0-5]?[0-9]):(?P<clock_seconds>[0-5]?[0-9])"),
+    "HH:MM:SS:ff": re.compile(r"(?P<hours>2[0-3]|[01]?[0-9]):(?P<clock_minutes>[0-5]?[0-9]):(?P<clock_seconds>[0-5]?[0-9])"
+                              r":(?P<clock_fraction>[0-9]{1,6})"),
+    "seconds": re.compile(r"(?P<number>[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?)"),
+}
+
+# Format of the time columns made of number, time and duration cells, which are converted without text parsing.
+TYPED_TIME_FORMAT = "typed"
+
+# Format of the time columns made of text cells matching none of TIME_FORMATS, which go through the free text date parser.
+FREE_TEXT_TIME_FORMAT = "text"
+
+# Formats convert_time_column converts with vectorized string operations.
+VECTORIZED_TIME_FORMATS = {"MM:SS", "MM:SS.ff", "HH:MM:SS"}
+
+# Number of non-empty cells at the top of a time column the format of the column is inferred from.
+TIME_FORMAT_SAMPLE_SIZE = 5
+
+# Maximum number of sanitized time cells whose verified time stamps are memoized.
+TIME_CELL_CACHE_SIZE = 4096
+
+# Cells longer than this are not handed to the free text date parser, which gets slow on long inputs.
+MAX_FREE_TEXT_TIME_LENGTH = 32
+
+# Matches the sanitized MM:SS, MM:SS.ff and HH:MM:SS time stamps that convert_time_column converts without verify_time_cell.
+FAST_TIME_REGEX = (r"^(?:(?P<minutes>[0-5]?[0-9]):(?P<seconds>[0-5]?[0-9])(?:\.(?P<fraction>[0-9]{1,6}))?"
+                   r"|(?P<hours>2[0-3]|[01]?[0-9]):(?P<clock_minutes>[0-5]?[0-9]):[0-5]?[0-9])\Z")
+
+# Cell values read from sheets as numbers, times or durations rather than text. They are converted to seconds directly.
+TYPED_TIME_CELLS = (int, float, datetime.time, datetime.datetime, datetime.timedelta)
 
 CUE_TIME_LABELS = ["Cue Start Time", "QLAB TIMING", "Exact Time"]
 EXAMPLE_LABELS = ["EXAMPLE FORM"]
 
 EMPTY_TIME_CELL_TOLERANCE = 2
 
-def find_first_cell_occurrences(csv_file: str, labels: List[str]) -> List[Tuple[int, int]]:
+# Maximum edit distance between a cell and a label for the cell to match the label when no cell matches it exactly.
+# Short labels are held to a lower distance (see label_edit_distance).
+LABEL_MAX_EDIT_DISTANCE = 2
+
+# Number of characters of a label per edit tolerated when matching it approximately, so that a short label such as
+# "Exact Time" tolerates one typo and does not match other headers such as "Exit Time".
+LABEL_LENGTH_PER_EDIT = 6
+
+# Maximum number of distinct cell texts whose label matches are memoized by each LabelMatcher.
+LABEL_CELL_CACHE_SIZE = 4096
+
+# Maximum number of label lists whose LabelMatcher is kept.
+LABEL_MATCHER_CACHE_SIZE = 16
+
+def normalize_label(text: str) -> str:
+    """
+    Normalizes the text of a cell or a label so that they can be compared, collapsing all whitespace.
+
+    :param text: Text to normalize.
+    :return: Normalized text.
+    """
+    return " ".join(text.split())
+
+def edit_distance(first: str, second: str) -> int:
+    """
+    Computes the Levenshtein distance between two strings with Myers' bit-parallel algorithm,
+    which keeps a whole column of the distance matrix in the bits of one integer.
+
+    :param first: First string.
+    :param second: Second string.
+    :return: Minimum number of single character insertions, deletions and substitutions turning one string into the other.
+    """
+    if len(first) < len(second):
+        first, second = second, first
+    if not second:
+        return len(first)
+
+    char_masks = dict()
+    for char_index, char in enumerate(second):
+        char_masks[char] = char_masks.get(char, 0) | (1 << char_index)
+    full_mask = (1 << len(second)) - 1
+    last_bit = 1 << (len(second) - 1)
+
+    positive = full_mask
+    negative = 0
+    distance = len(second)
+    for char in first:
+        matches = char_masks.get(char, 0)
+        vertical = matches | negative
+        horizontal = ((((matches & positive) + positive) ^ positive) | matches) & full_mask
+        horizontal_positive = negative | (~(horizontal | positive) & full_mask)
+        horizontal_negative = positive & horizontal
+        if horizontal_positive & last_bit:
+            distance += 1
+        elif horizontal_negative & last_bit:
+            distance -= 1
+        horizontal_positive = ((horizontal_positive << 1) | 1) & full_mask
+        horizontal_negative = (horizontal_negative << 1) & full_mask
+        positive = horizontal_negative | (~(vertical | horizontal_positive) & full_mask)
+        negative = horizontal_positive & vertical
+    return distance
+
+def label_edit_distance(label: str, max_distance: int) -> int:
+    """
+    Returns the maximum edit distance at which a cell still matches the given label, which grows with the length
+    of the label by one edit per LABEL_LENGTH_PER_EDIT characters, with at least one edit.
+
+    :param label: Label to match.
+    :param max_distance: Maximum edit distance for any label, 0 to only match labels exactly.
+    :return: Maximum edit distance for the label.
+    """
+    return min(max_distance, max(1, len(label) // LABEL_LENGTH_PER_EDIT))
+
+def label_segments(label: str, distance: int) -> List[str]:
+    """
+    Splits a label into one more contiguous segment than the given edit distance, of lengths as equal as possible.
+    Each edit changes at most one segment, so a text within the edit distance of the label contains one of them unchanged.
+
+    :param label: Label to split.
+    :param distance: Maximum edit distance.
+    :return: Segments of the label, in order.
+    """
+    bounds = [len(label) * segment_num // (distance + 1) for segment_num in range(distance + 2)]
+    return [label[start:end] for start, end in zip(bounds, bounds[1:])]
+
+@dataclass
+class LabelMatcher():
+    """
+    Matches cell texts against CUE_TIME_LABELS and EXAMPLE_LABELS, exactly or within the edit distance of each label
+    (see label_edit_distance), ignoring case.
+    Each label is split into segments (see label_segments). A text within the edit distance contains one of them
+    unchanged, moved by at most the edit distance, so every window of a text length a segment can be found at is indexed
+    with the segment. A cell is only compared to the labels whose segment is in one of the windows of its length,
+    which takes one lookup per window, and the windows of a length are shared by all labels of about that length.
+    """
+
+    time_labels: FrozenSet[str]
+    example_labels: FrozenSet[str]
+    max_edit_distance: int = 0
+    folded_time_labels: Set[str] = field(default_factory=set, repr=False)
+    folded_example_labels: Set[str] = field(default_factory=set, repr=False)
+    label_distances: Dict[str, int] = field(default_factory=dict, repr=False)
+    window_labels: Dict[int, Dict[Tuple[int, str], Set[str]]] = field(default_factory=dict, repr=False)
+    windows: Dict[int, List[Tuple[int, int]]] = field(default_factory=dict, repr=False)
+    unsegmented_labels: Dict[int, Set[str]] = field(default_factory=dict, repr=False)
+    results: Dict[str, Tuple[bool, bool]] = field(default_factory=dict, repr=False)
+
+    def __post_init__(self):
+        self.folded_time_labels = {label.casefold() for label in self.time_labels}
+        self.folded_example_labels = {label.casefold() for label in self.example_labels}
+        if not self.max_edit_distance:
+            return
+
+        windows = dict()
+        for label in self.time_labels | self.example_labels:
+            folded_label = label.casefold()
+            distance = label_edit_distance(label, self.max_edit_distance)
+            self.label_distances[folded_label] = max(distance, self.label_distances.get(folded_label, 0))
+            if distance >= len(folded_label):
+                # A label no longer than its edit distance has no segment every similar text contains.
+                for text_length in range(len(folded_label) + distance + 1):
+                    self.unsegmented_labels.setdefault(text_length, set()).add(folded_label)
+                continue
+            for text_length in range(len(folded_label) - distance, len(folded_label) + distance + 1):
+                window_labels = self.window_labels.setdefault(text_length, dict())
+                offset = 0
+                for segment in label_segments(folded_label, distance):
+                    # The edits before an unchanged segment move it by at most the edit distance.
+                    for start in range(max(0, offset - distance), min(offset + distance, text_length - len(segment)) + 1):
+                        window_labels.setdefault((start, segment), set()).add(folded_label)
+                        windows.setdefault(text_length, set()).add((start, len(segment)))
+                    offset += len(segment)
+        self.windows = {text_length: sorted(text_windows) for text_length, text_windows in windows.items()}
+
+    @property
+    def key(self) -> Tuple[FrozenSet[str], FrozenSet[str], int]:
+        """
+        Hashable key identifying the labels and edit distance the matcher was built for.
+        """
+        return self.time_labels, self.example_labels, self.max_edit_distance
+
+    def similar_labels(self, text: str) -> Set[str]:
+        """
+        Finds the labels the given normalized text is within the edit distance of, ignoring case.
+
+        :param text: Normalized text of a cell.
+        :return: Casefolded labels similar to the text.
+        """
+        folded_text = text.casefold()
+        candidates = set(self.unsegmented_labels.get(len(folded_text), ()))
+        windows = self.windows.get(len(folded_text), ())
+        window_labels = self.window_labels.get(len(folded_text))
+        for start, length in windows:
+            labels = window_labels.get((start, folded_text[start:start + length]))
+            if labels:
+                candidates |= labels
+        return {label for label in candidates if edit_distance(folded_text, label) <= self.label_distances[label]}
+
+    def classify(self, text: str) -> Tuple[bool, bool]:
+        """
+        Checks whether the normalized text of a cell matches one of the labels, exactly or within the edit distance.
+        Results are memoized, since sheets repeat the same text many times.
+
+        :param text: Normalized text of a cell.
+        :return: Whether the cell can be any label, and whether it can be a cue time label.
+        """
+        result = self.results.get(text)
+        if result is not None:
+            return result
+
+        is_time_label = text in self.time_labels
+        is_example_label = text in self.example_labels
+        if text and not (is_time_label and is_example_label):
+            similar_labels = self.similar_labels(text)
+            if similar_labels:
+                is_time_label = is_time_label or not similar_labels.isdisjoint(self.folded_time_labels)
+                is_example_label = is_example_label or not similar_labels.isdisjoint(self.folded_example_labels)
+
+        if len(self.results) >= LABEL_CELL_CACHE_SIZE:
+            self.results.clear()
+        result = self.results[text] = (is_time_label or is_example_label, is_time_label)
+        return result
+
+@lru_cache(maxsize=LABEL_MATCHER_CACHE_SIZE)
+def build_label_matcher(time_labels: FrozenSet[str], example_labels: FrozenSet[str], max_edit_distance: int) -> LabelMatcher:
+    """
+    Builds the matcher of the given labels once for all sheets.
+
+    :param time_labels: Normalized cue time labels.
+    :param example_labels: Normalized example labels.
+    :param max_edit_distance: Maximum edit distance at which misspelled labels still match.
+    :return: Label matcher.
+    """
+    return LabelMatcher(time_labels, example_labels, max_edit_distance)
+
+def label_matcher(max_edit_distance: int = 0) -> LabelMatcher:
+    """
+    Returns the matcher of the current CUE_TIME_LABELS and EXAMPLE_LABELS, so that labels added to them at runtime
+    are matched from then on.
+
+    :param max_edit_distance: Maximum edit distance at which misspelled labels still match.
+    :return: Label matcher.
+    """
+    return build_label_matcher(frozenset(map(normalize_label, CUE_TIME_LABELS)),
+                               frozenset(map(normalize_label, EXAMPLE_LABELS)), max_edit_distance)
+
+@dataclass
+class SheetIndex():
+    """
+    Inverted index of the label cells of a sheet, mapping normalized cell text to the positions of the cells.
+    Built once per sheet while scanning it, so that looking up any label afterwards does not rescan the sheet.
+    Only the cells matching CUE_TIME_LABELS or EXAMPLE_LABELS are indexed (see LabelMatcher), so that the index of
+    a sheet of any size stays small.
+    """
+
+    positions: Dict[str, List[Tuple[int, int]]] = field(default_factory=dict)
+
+    def add(self, text: str, position: Tuple[int, int]) -> bool:
+        """
+        Adds a text cell to the index.
+
+        :param text: Normalized text of the cell.
+        :param position: Row and column of the cell.
+        :return: True if no cell with the same text was indexed before, False otherwise.
+        """
+        is_new = text not in self.positions
+        self.positions.setdefault(text, []).append(position)
+        return is_new
+
+    def find(self, label: str) -> List[Tuple[int, int]]:
+        """
+        Finds the positions of all cells matching the given label.
+
+        :param label: Label to look for.
+        :return: Rows and columns of the cells matching the label, in the order they appear in the sheet.
+        """
+        return self.positions.get(normalize_label(label), [])
+
+    def find_similar(self, label: str, max_distance: int) -> List[Tuple[int, int]]:
+        """
+        Finds the positions of all cells within the given edit distance of the given label, ignoring case.
+        Only the few texts of the indexed label cells are compared to the label.
+
+        :param label: Label to look for.
+        :param max_distance: Maximum edit distance.
+        :return: Rows and columns of the cells similar to the label, in the order they appear in the sheet.
+        """
+        folded_label = normalize_label(label).casefold()
+        matches = []
+        for text, positions in self.positions.items():
+            if abs(len(text) - len(folded_label)) <= max_distance and edit_distance(text.casefold(), folded_label) <= max_distance:
+                matches.extend(positions)
+        return sorted(matches)
+
+def find_first_cell_occurrences(index: SheetIndex, labels: List[str], max_edit_distance: int = 0) -> List[Tuple[int, int]]:
     """
-    Finds the first occurrences of one of the given labels in the given csv file and returns their positions.
-    :param labels: Labels to look for,
+    Finds the first occurrences of one of the given labels in the given sheet index and returns their positions.
+    If none of the labels is found exactly, looks for cells within the edit distance of the labels to tolerate typos
+    (see label_edit_distance).
+
+    :param index: Index of the sheet to search in.
+    :param labels: Labels to look for, in the order of priority.
+    :param max_edit_distance: Maximum edit distance between a cell and any label, 0 to only look for exact matches.
     :return: Positions of the first occurrences of one of the given labels.
     """
     found_time_cells = []
     for label in labels:
-        found_time_cells = find_cell(csv_file, label)
+        found_time_cells = index.find(label)
         if found_time_cells:
-            break
+            return found_time_cells
+    if max_edit_distance:
+        for label in labels:
+            found_time_cells = index.find_similar(label, label_edit_distance(label, max_edit_distance))
+            if found_time_cells:
+                break
     return found_time_cells
 
-def remove_example_tables(cue_time_positions: List[Tuple[int, int]], example_positions: List[Tuple[int, int]]):
+@dataclass
+class TableRegion():
     """
-    Removes the example cue tables by cross-checking the rows and columns for the example label position and cue times position.
+    Bounding box of a cue table in a sheet: the cell of its cue time label, and the last row of its time column.
+    """
+
+    header_row: int
+    column: int
+    end_row: int
+    cells: List[Any] = field(default_factory=list, repr=False)
+    is_example: bool = False
 
-    :param cue_time_positions: Positions of all "Cue Start Time" cells.
-    :param example_positions: Positions of all "EXAMPLE FORM" cells.
-    :return: Filtered list of cue time positions.
+def detect_table_regions(index: SheetIndex, columns: Dict[Tuple[int, int], List[Any]],
+                         max_edit_distance: int = 0) -> List[TableRegion]:
     """
-    final_cue_times = deepcopy(cue_time_positions)
+    Finds the region of every cue table of a scanned sheet and marks the example tables.
+    Each example label contains one cue table below it: the nearest by row, then by column, of the tables of the form
+    starting below the label. That form starts at the leftmost of the forms side by side below the label, in or right
+    of its column, and ends where the next form beside it starts, or at the next example label in the same row. This way example forms placed
+    side by side with each other or with the real forms each lose their own table only, even when the real form beside
+    an example form starts higher up.
 
-    for example_position in example_positions:
-        for cue_time_position_index, cue_time_position in enumerate(final_cue_times):
-            if cue_time_position[0] > example_position[0]:
-                final_cue_times.pop(cue_time_position_index)
-                break
+    :param index: Index of the label cells of the sheet (see scan_sheet).
+    :param columns: Cells below each cue time label keyed by its position (see scan_sheet).
+    :param max_edit_distance: Maximum edit distance at which misspelled labels still match, 0 to only match labels exactly.
+    :return: Regions of the cue tables, in the order their labels appear in the sheet.
+    """
+    regions = [TableRegion(row_num, col_num, row_num + len(columns[(row_num, col_num)]), columns[(row_num, col_num)])
+               for row_num, col_num in find_first_cell_occurrences(index, CUE_TIME_LABELS, max_edit_distance)]
+    header_rows = [region.header_row for region in regions]
+
+    example_columns = dict()
+    for row_num, col_num in find_first_cell_occurrences(index, EXAMPLE_LABELS, max_edit_distance):
+        example_columns.setdefault(row_num, []).append(col_num)
 
-    return final_cue_times
+    for row_num, col_nums in example_columns.items():
+        col_nums.sort()
+        for example_num, col_num in enumerate(col_nums):
+            label_end = col_nums[example_num + 1] if example_num + 1 < len(col_nums) else math.inf
+            # Regions are in row order, so the ones below the label start right after the last one in or above its row.
+            below = [region for region in regions[bisect_right(header_rows, row_num):]
+                     if not region.is_example and col_num <= region.column < label_end]
+            if not below:
+                continue
+            # The forms starting below the label side by side are the ones whose tables start before the nearest
+            # table ends. The form of the label is the leftmost of them, and ends where the next one starts.
+            nearest = min(below, key=lambda region: (region.header_row, region.column))
+            form_columns = sorted({region.column for region in below if region.header_row <= nearest.end_row})
+            form_end = form_columns[1] if len(form_columns) > 1 else label_end
+            example_region = min((region for region in below if region.column < form_end),
+                                 key=lambda region: (region.header_row - row_num, region.column - col_num))
+            example_region.is_example = True
+
+    return regions
 
 def sanitize_cell(cell: str) -> Optional[str]:
     """
@@ -74,23 +422,75 @@ def sanitize_cell(cell: str) -> Optional[str]:
     return cell
 
 
-def save_excel_sheets_as_csv(excel_file: str) -> List[str]:
+def cell_text(cell: Any) -> str:
+    """
+    Converts a raw cell value to the text it is displayed as, the way pandas writes it to a CSV file.
+
+    :param cell: Raw cell value as read from the sheet.
+    :return: Text of the cell, or an empty string if the cell is blank.
     """
-    Saves each sheet in an Excel file as a separate CSV file.
+    # NaN and NaT are the only cell values that are not equal to themselves.
+    if cell is None or cell != cell:
+        return ""
+    return str(cell)
+
+def load_excel_sheets(excel_file: str, sheet_names: Optional[Collection[str]] = None) -> Iterator[Tuple[str, List[List[Any]]]]:
+    """
+    Loads each sheet in an Excel file into an in-memory grid of raw cell values.
 
     :param excel_file: Excel file path.
-    :return: List of sheet names saved as separate CSV files.
+    :param sheet_names: Names of the sheets to load, or None to load all sheets.
+    :return: Iterator over sheet names and the rows of each sheet, in the workbook order.
     """
-    saved = []
+    import pandas as pd
+
     excel_data = pd.ExcelFile(excel_file)
 
     for sheet_name in excel_data.sheet_names:
-        df = excel_data.parse(sheet_name)
-        csv_file = f"{sheet_name}.csv"
-        df.to_csv(csv_file, index=False)
-        saved.append(csv_file)
+        if sheet_names is None or sheet_name in sheet_names:
+            yield sheet_name, excel_data.parse(sheet_name, header=None).values.tolist()
+
+def stream_excel_sheets(excel_file: str, sheet_names: Optional[Collection[str]] = None) -> Iterator[Tuple[str, Iterator[Tuple[Any, ...]]]]:
+    """
+    Streams each sheet in an Excel file row by row using a read-only workbook.
+    Rows are only read from the file as they are consumed, so each sheet must be consumed before moving on to the next one.
+
+    :param excel_file: Excel file path.
+    :param sheet_names: Names of the sheets to stream, or None to stream all sheets.
+    :return: Iterator over sheet names and lazy iterators over the rows of each sheet, in the workbook order.
+    """
+    import openpyxl
 
-    return saved
+    workbook = openpyxl.load_workbook(excel_file, read_only=True, data_only=True)
+
+    try:
+        for worksheet in workbook.worksheets:
+            if sheet_names is not None and worksheet.title not in sheet_names:
+                continue
+            # The dimensions recorded in the file may be wrong, and would cut the rows past them off.
+            worksheet.reset_dimensions()
+            rows = worksheet.iter_rows(values_only=True)
+            yield worksheet.title, (tuple(normalize_number(cell) for cell in row) for row in rows)
+    finally:
+        workbook.close()
+
+def normalize_number(cell: Any) -> Any:
+    """
+    Converts whole floats to integers, matching the cell values produced by pandas.
+
+    :param cell: Raw cell value.
+    :return: The cell value, with whole floats converted to integers.
+    """
+    if isinstance(cell, float) and cell.is_integer():
+        return int(cell)
+    return cell
+
+# Backends that can be used by extract_tables to read the sheets of an Excel file.
+EXCEL_READERS = {
+    "pandas": load_excel_sheets,
+    "openpyxl": stream_excel_sheets,
+    "stdlib": stream_xlsx_sheets,
+}
 
 def convert_to_seconds(time: str) -> float:
     """
@@ -110,126 +510,663 @@ def convert_to_seconds(time: str) -> float:
 
 def verify_time_cell(time: str) -> Optional[str]:
     """
-    Converts the given cell to the valid QLab time format ("%H:%M:%S.%f").
+    Converts the given cell to the valid QLab time format ("%M:%S.%f").
 
     :param time: Cell with the time stamp to be converted.
-    :return: Time string in the format "%H:%M:%S.%f", or None if the cell is not a valid time stamp.
+    :return: Time string in the format "%M:%S.%f", or None if the cell is not a valid time stamp.
     """
-    time = sanitize_cell(time)
+    return verify_sanitized_time(sanitize_cell(time))
+
+@lru_cache(maxsize=TIME_CELL_CACHE_SIZE)
+def verify_sanitized_time(time: str) -> Optional[str]:
+    """
+    Converts the given sanitized cell to the valid QLab time format ("%M:%S.%f").
+    Results are memoized, since cue sheets repeat the same time stamps and filler text many times.
+
+    :param time: Sanitized cell with the time stamp to be converted.
+    :return: Time string in the format "%M:%S.%f", or None if the cell is not a valid time stamp.
+    """
+    match = TIME_CELL_PATTERN.fullmatch(time)
+
+    if match and match["minutes"]:
+        fraction = (match["fraction"] or "").ljust(2, "0")[:2]
+        return f"{int(match['minutes']):02d}:{int(match['seconds']):02d}.{fraction}"
+    if match and match["clock_fraction"]:
+        fraction = match["clock_fraction"].ljust(2, "0")[:2]
+        return f"{int(match['clock_minutes']):02d}:{int(match['clock_seconds']):02d}.{fraction}"
+    if match and match["hours"]:
+        # HH:MM:SS cells are Excel times typed as MM:SS, so the seconds are dropped.
+        return f"{int(match['hours']):02d}:{int(match['clock_minutes']):02d}.00"
+
+    if match:
+        time_parts = split_seconds(float(time))
+        if time_parts is None:
+            return None
+        return "{:02d}:{:02d}.{:02d}".format(*time_parts)
+
+    time_obj = parse_free_text_time(time)
+    if time_obj is None:
+        return None
 
-    try:
-        time_obj = datetime.datetime.strptime(time, CUE_TIME_FORMAT)
-    except ValueError:
-        try:
-            time_obj = datetime.datetime.strptime(time, CUE_TIME_FORMAT_MS)
-        except ValueError:
-            try:
-                time_obj = datetime.datetime.strptime(time, CUE_TIME_FORMAT_HOURS)
-                time_stamp = datetime.datetime.strftime(time_obj, CUE_TIME_FORMAT_HOURS_DECIMAl)
-                return time_stamp[:-4]
-            except ValueError:
-                try:
-                    time_obj = datetime.datetime.strptime(time, CUE_TIME_FORMAT_COLONS)
-                except ValueError:
-                    try:
-                        time_obj = datetime.datetime.fromtimestamp(float(time))
-                    except ValueError:
-                        try:
-                            time_obj = parse(time)
-                        except ParserError:
-                            return None
-
-    #TODO: clean up
     time_stamp = datetime.datetime.strftime(time_obj, CUE_TIME_FORMAT_MS)
     return time_stamp[:-4]
 
-def find_cell(csv_file: str, value: str) -> List[Tuple[int, int]]:
+def split_seconds(seconds: float) -> Optional[Tuple[int, int, int]]:
     """
-    Finds the rows and columns of all cells with the specified value.
+    Splits a number of seconds into minutes, seconds and hundredths of a second, truncating anything shorter.
+    Minutes are not wrapped at the hour.
 
-    :param csv_file: CSV file to search in.
-    :param value: Value to search for (will be cast to string for comparison).
-    :return: List with rows and columns of cells matching the given value.
+    :param seconds: Number of seconds.
+    :return: Minutes, seconds and hundredths of a second, or None if the number is negative or not finite.
     """
-    matches = []
+    if not math.isfinite(seconds) or seconds < 0:
+        return None
 
-    with open(csv_file, 'r') as file:
-        reader = csv.reader(file)
-        for row_num, row in enumerate(reader):
-            if row_num > 1000:
-                break
-            for col_num, cell in enumerate(row):
-                if col_num > 1000:
-                    break
-                if cell.strip() == value.strip():
-                    matches.append((row_num, col_num))
-    return matches
+    whole_seconds = math.floor(seconds)
+    # Rounds to microseconds before truncating, like datetime does, so that 11.95 is not truncated to 11.94.
+    microseconds = round((seconds - whole_seconds) * 1_000_000)
+    if microseconds == 1_000_000:
+        whole_seconds += 1
+        microseconds = 0
+    minutes, whole_seconds = divmod(whole_seconds, 60)
+    return minutes, whole_seconds, microseconds // 10_000
+
+def is_typed_time_cell(cell: Any) -> bool:
+    """
+    Checks whether a raw cell value is a number, time or duration that typed_cell_seconds can convert without text parsing.
+
+    :param cell: Raw cell value as read from the sheet.
+    :return: True if the cell is a typed time cell, False if it is text or blank.
+    """
+    # Booleans are integers, and NaN and NaT are the only values that are not equal to themselves.
+    return isinstance(cell, TYPED_TIME_CELLS) and not isinstance(cell, bool) and cell == cell
+
+def typed_cell_seconds(cell: Any) -> Optional[float]:
+    """
+    Converts a number, time or duration cell directly to seconds, giving the same result as its text would.
+    Numbers are seconds. Times and durations without seconds are Excel's reading of MM:SS typed into a cell as HH:MM,
+    so their hours are taken as the minutes and their minutes as the seconds. Times and durations with seconds are read as is.
+    Fractions of a second are truncated to hundredths.
+
+    :param cell: Typed time cell (see is_typed_time_cell).
+    :return: Number of seconds the cell represents, or None if the cell is not a valid time stamp.
+    """
+    if isinstance(cell, datetime.datetime):
+        cell = cell.time()
+    if isinstance(cell, datetime.time):
+        hours, minutes, seconds, microseconds = cell.hour, cell.minute, cell.second, cell.microsecond
+    elif isinstance(cell, datetime.timedelta):
+        if cell < datetime.timedelta(0):
+            return None
+        hours, seconds = divmod(cell.days * 24 * 60 * 60 + cell.seconds, 60 * 60)
+        minutes, seconds = divmod(seconds, 60)
+        microseconds = cell.microseconds
+    else:
+        time_parts = split_seconds(float(cell))
+        if time_parts is None:
+            return None
+        minutes, seconds, hundredths = time_parts
+        return round(seconds + hundredths / 100, 2) + minutes * 60.0
+
+    if seconds == 0 and microseconds == 0:
+        return float(minutes) + hours * 60.0
+    minutes, seconds = divmod((hours * 60 + minutes) * 60 + seconds, 60)
+    # Rounding to two decimals gives the same float as parsing the truncated time string "SS.ff".
+    return round(seconds + microseconds // 10_000 / 100, 2) + minutes * 60.0
+
+def infer_time_format(cells: Iterable[Any]) -> Optional[str]:
+    """
+    Infers the format most of the cells of a time column are written in from its first TIME_FORMAT_SAMPLE_SIZE non-empty cells.
+
+    :param cells: Text and typed time cells of the column, top to bottom.
+    :return: One of TIME_FORMATS, TYPED_TIME_FORMAT or FREE_TEXT_TIME_FORMAT, or None if the column has no non-empty cells.
+    The first format to appear wins ties.
+    """
+    format_counts = dict()
+    for cell in cells:
+        if isinstance(cell, str):
+            time = sanitize_cell(cell)
+            if not time:
+                continue
+            time_format = next((time_format for time_format, pattern in TIME_FORMATS.items() if pattern.fullmatch(time)),
+                               FREE_TEXT_TIME_FORMAT)
+        else:
+            time_format = TYPED_TIME_FORMAT
+        format_counts[time_format] = format_counts.get(time_format, 0) + 1
+        if sum(format_counts.values()) == TIME_FORMAT_SAMPLE_SIZE:
+            break
+    return max(format_counts, key=format_counts.get) if format_counts else None
+
+def matched_time_seconds(time_format: str, match: re.Match) -> float:
+    """
+    Converts a time cell matched by the pattern of one of TIME_FORMATS to seconds, giving the same result as verify_time_cell
+    and convert_to_seconds.
+
+    :param time_format: Format whose pattern matched the sanitized cell.
+    :param match: Match of the pattern.
+    :return: Number of seconds the cell represents, or None if the cell is not a valid time stamp.
+    """
+    if time_format == "MM:SS":
+        return float(match["seconds"]) + float(match["minutes"]) * 60
+    if time_format == "MM:SS.ff":
+        # verify_time_cell truncates the fraction of a second to two digits.
+        return float(match["seconds"] + "." + match["fraction"].ljust(2, "0")[:2]) + float(match["minutes"]) * 60
+    if time_format == "HH:MM:SS":
+        # verify_time_cell reads HH:MM:SS cells as MM:SS, dropping the seconds.
+        return float(match["clock_minutes"]) + float(match["hours"]) * 60
+    if time_format == "HH:MM:SS:ff":
+        return (float(match["clock_seconds"] + "." + match["clock_fraction"].ljust(2, "0")[:2])
+                + float(match["clock_minutes"]) * 60)
+    return typed_cell_seconds(float(match["number"]))
+
+def convert_time_cell(cell: Any, time_format: Optional[str] = None) -> Optional[float]:
+    """
+    Converts one time cell to seconds, trying the pattern of the format inferred for its column before verify_time_cell.
+
+    :param cell: Text or typed time cell.
+    :param time_format: Format inferred for the column of the cell (see infer_time_format), or None if not known.
+    :return: Number of seconds the cell represents, or None if the cell is not a valid time stamp.
+    """
+    if not isinstance(cell, str):
+        return typed_cell_seconds(cell)
+
+    pattern = TIME_FORMATS.get(time_format)
+    if pattern is not None:
+        match = pattern.fullmatch(sanitize_cell(cell))
+        if match:
+            return matched_time_seconds(time_format, match)
+    return convert_to_seconds(verify_time_cell(cell))
+
+def parse_free_text_time(time: str) -> Optional[datetime.datetime]:
+    """
+    Parses a cell that matches none of the known time formats with the free text date parser.
+    Cells longer than MAX_FREE_TEXT_TIME_LENGTH or without any digits are rejected up front to cap the cost of the call.
+
+    :param time: Sanitized cell to be parsed.
+    :return: Parsed date and time, or None if the cell is not a valid time stamp.
+    """
+    if len(time) > MAX_FREE_TEXT_TIME_LENGTH or not any(char.isdigit() for char in time):
+        return None
+
+    from dateutil.parser import parse
+
+    try:
+        return parse(time)
+    except (ValueError, OverflowError):
+        return None
+
+def classify_label(text: str, max_edit_distance: int = 0) -> Tuple[bool, bool]:
+    """
+    Checks whether the normalized text of a cell matches one of CUE_TIME_LABELS or EXAMPLE_LABELS,
+    exactly or within the given edit distance (see LabelMatcher).
+
+    :param text: Normalized text of a cell.
+    :param max_edit_distance: Maximum edit distance at which misspelled labels still match.
+    :return: Whether the cell can be any label, and whether it can be a cue time label.
+    """
+    return label_matcher(max_edit_distance).classify(text)
+
+def shared_label_indices(strings: SharedStrings, matcher: LabelMatcher) -> Set[int]:
+    """
+    Finds the shared strings that match one of the labels of the matcher, exactly or within the edit distance,
+    so that scan_sheet can skip every other shared string cell without decoding it.
+
+    :param strings: Shared strings of the workbook.
+    :param matcher: Matcher of the labels.
+    :return: Indices of the shared strings that can be labels.
+    """
+    return strings.indices_matching(("labels", matcher.key), lambda text: matcher.classify(normalize_label(text))[0])
 
-def parse_times(csv_file: str, times_position: Tuple[int, int]) -> Optional[List[str]]:
+def scan_sheet(rows: Iterable[Sequence[Any]], max_edit_distance: int = 0) -> Tuple[SheetIndex, Dict[Tuple[int, int], List[str]]]:
     """
-    Returns the list of times to be input into QLab given the position of the "Cue Start Time" cell position.
+    Scans the rows of a sheet once, indexing the cells that can be labels and collecting the cells below every cue time label
+    along the way. A column stops being collected at the first blank cell past EMPTY_TIME_CELL_TOLERANCE, since that cell
+    ends the table, and only the cells of the columns still being collected are read from each row.
+    Nothing else is kept, so streamed sheets of any height are scanned in memory proportional to their labels and tables.
 
-    :param csv_file: CSV file to search in.
-    :param times_position: Position of the "Cue Start Time" cell position.
+    :param rows: Rows of raw cell values of the sheet.
+    :param max_edit_distance: Maximum edit distance between a cell and a label for the cell to be indexed.
+    :return: Index of the label cells of the sheet, and the cells below each cue time label keyed by its position,
+    as typed time cells (see is_typed_time_cell) or text.
+    """
+    index = SheetIndex()
+    columns = dict()
+    open_columns = dict()
+    label_indices = None
+    matcher = label_matcher(max_edit_distance)
+
+    for row_num, row in enumerate(rows):
+        if open_columns:
+            row_length = len(row)
+            for position, column in list(open_columns.items()):
+                target_col_num = position[1]
+                cell = row[target_col_num] if target_col_num < row_length else None
+                # Typed time cells are kept as they are, only the others are converted to text.
+                if not is_typed_time_cell(cell):
+                    cell = cell_text(cell)
+                    if not cell.strip() and len(column) >= EMPTY_TIME_CELL_TOLERANCE:
+                        del open_columns[position]
+                column.append(cell)
+        for col_num, cell in enumerate(row):
+            if isinstance(cell, SharedString):
+                if label_indices is None:
+                    label_indices = shared_label_indices(cell.strings, matcher)
+                if cell.index not in label_indices:
+                    continue
+                cell = str(cell)
+            elif not isinstance(cell, str):
+                continue
+            value = normalize_label(cell)
+            is_label, is_time_label = matcher.classify(value)
+            if not is_label:
+                continue
+            index.add(value, (row_num, col_num))
+            if is_time_label:
+                columns[(row_num, col_num)] = open_columns[(row_num, col_num)] = []
+
+    return index, columns
+
+def convert_time_column(cells: Sequence[Any], time_format: Optional[str] = None) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Converts a whole column of time cells to seconds at once.
+    Typed time cells are converted directly with typed_cell_seconds. Text MM:SS, MM:SS.ff and HH:MM:SS cells are converted
+    with vectorized string operations, only the remaining non-empty text cells go through verify_time_cell
+    and convert_to_seconds one by one.
+
+    :param cells: Text and typed time cells of the column, top to bottom.
+    :param time_format: Format inferred for the column (see infer_time_format). If it is one of VECTORIZED_TIME_FORMATS,
+    the cells are only matched against its pattern, and the cells in other formats are converted one by one.
+    :return: Number of seconds each cell represents (NaN for invalid cells), and the mask of cells that are valid time stamps.
+    """
+    import numpy as np
+    import pandas as pd
+
+    original_cells = cells
+    typed_cells = [cell_num for cell_num, cell in enumerate(cells) if not isinstance(cell, str)]
+    if typed_cells:
+        cells = [cell if isinstance(cell, str) else "" for cell in cells]
+
+    column = pd.Series(cells, dtype=object)
+    sanitized = (column.str.replace(" ", "", regex=False)
+                 .str.split("-", n=1).str[0].str.strip()
+                 .str.split(",", n=1).str[0].str.strip())
+    if time_format in VECTORIZED_TIME_FORMATS:
+        parts = sanitized.str.extract(rf"^(?:{TIME_FORMATS[time_format].pattern})\Z")
+        # The groups the pattern of the format does not have are filled with NaN, as when they do not match.
+        parts = parts.reindex(columns=["minutes", "seconds", "fraction", "hours", "clock_minutes"]).astype(object)
+    else:
+        parts = sanitized.str.extract(FAST_TIME_REGEX)
+
+    seconds = np.full(len(column), np.nan)
+    short_times = parts["minutes"].notna().to_numpy()
+    clock_times = parts["hours"].notna().to_numpy()
+
+    # verify_time_cell truncates the fraction of a second to two digits.
+    fraction = parts["fraction"][short_times].fillna("").str.pad(2, side="right", fillchar="0").str[:2]
+    seconds[short_times] = ((parts["seconds"][short_times] + "." + fraction).astype(np.float64).to_numpy()
+                            + parts["minutes"][short_times].astype(np.float64).to_numpy() * 60)
+    # verify_time_cell reads HH:MM:SS cells as MM:SS, dropping the seconds.
+    seconds[clock_times] = (parts["clock_minutes"][clock_times].astype(np.float64).to_numpy()
+                            + parts["hours"][clock_times].astype(np.float64).to_numpy() * 60)
+    valid = short_times | clock_times
+
+    leftovers = np.flatnonzero(~valid & (sanitized != "").to_numpy())
+    for cell_num in leftovers:
+        verified_time = convert_to_seconds(verify_time_cell(cells[cell_num]))
+        if verified_time is not None:
+            seconds[cell_num] = verified_time
+            valid[cell_num] = True
+
+    for cell_num in typed_cells:
+        typed_seconds = typed_cell_seconds(original_cells[cell_num])
+        if typed_seconds is not None:
+            seconds[cell_num] = typed_seconds
+            valid[cell_num] = True
+
+    return seconds, valid
+
+def parse_times(cells: List[Any], vectorized: bool = False) -> List[float]:
+    """
+    Returns the list of times to be input into QLab given the cells below the "Cue Start Time" cell.
+
+    :param cells: Text and typed time cells below the "Cue Start Time" cell, top to bottom.
+    :param vectorized: Whether to convert the whole column at once with convert_time_column, or cell by cell without NumPy.
+    Cell by cell is faster for columns of any realistic length, since the string operations of pandas loop in Python too.
     :return: List of times to be input into QLab.
     """
-    times = []
-    target_row_num, target_col_num = times_position
+    return parse_time_column(cells, vectorized)[0]
 
-    with open(csv_file, 'r') as file:
-        reader = csv.reader(file)
-        for row_num, row in enumerate(reader):
-            if row_num > 1000:
-                break
-            for col_num, cell in enumerate(row):
-                if col_num > 1000:
-                    break
-                if col_num == target_col_num and row_num > target_row_num:
-                    verified_time = convert_to_seconds(verify_time_cell(cell))
-                    if not verified_time and row_num > target_row_num + EMPTY_TIME_CELL_TOLERANCE:
-                        return times
-                    if verified_time:
-                        times.append(verified_time)
+def parse_time_column(cells: List[Any], vectorized: bool = False) -> Tuple[List[float], Optional[str]]:
+    """
+    Infers the format of the cells below the "Cue Start Time" cell, then parses them with that format.
+
+    :param cells: Text and typed time cells below the "Cue Start Time" cell, top to bottom.
+    :param vectorized: Whether to convert the whole column at once with convert_time_column, or cell by cell without NumPy.
+    :return: List of times to be input into QLab, and the format inferred for the column (see infer_time_format).
+    """
+    if not cells:
+        return [], None
+
+    time_format = infer_time_format(cells)
+    if not vectorized:
+        return parse_time_cells(cells, time_format), time_format
+
+    import numpy as np
+
+    seconds, valid = convert_time_column(cells, time_format)
+    verified = valid & (seconds != 0)
+
+    # The table ends at the first cell past EMPTY_TIME_CELL_TOLERANCE without a time stamp.
+    table_ends = np.flatnonzero(~verified[EMPTY_TIME_CELL_TOLERANCE:])
+    table_end = EMPTY_TIME_CELL_TOLERANCE + table_ends[0] if table_ends.size else len(cells)
+
+    return seconds[:table_end][verified[:table_end]].tolist(), time_format
+
+def parse_time_cells(cells: List[Any], time_format: Optional[str] = None) -> List[float]:
+    """
+    Returns the list of times to be input into QLab given the cells below the "Cue Start Time" cell,
+    converting the cells one by one with convert_time_cell.
 
+    :param cells: Text and typed time cells below the "Cue Start Time" cell, top to bottom.
+    :param time_format: Format inferred for the column (see infer_time_format), or None if not known.
+    :return: List of times to be input into QLab.
+    """
+    times = []
+    for cell_num, cell in enumerate(cells):
+        seconds = convert_time_cell(cell, time_format)
+        if seconds:
+            times.append(seconds)
+        elif cell_num >= EMPTY_TIME_CELL_TOLERANCE:
+            # The table ends at the first cell past EMPTY_TIME_CELL_TOLERANCE without a time stamp.
+            break
     return times
 
-def extract_tables(excel_file: str) -> [List[List[str]]]:
+def group_cue_tables(tables: List[Any]) -> Optional[Union[Any, Dict[str, Any]]]:
+    """
+    Groups what was extracted from each cue table of a sheet the way extract_sheet returns it.
+
+    :param tables: Values extracted from each cue table, in the order of the tables.
+    :return: Value of the only cue table in the sheet, values of each cue table keyed by "Part N" if there are several,
+    or None if the sheet has no cue tables.
+    """
+    if len(tables) == 1:
+        return tables[0]
+    if tables:
+        return {f"Part {table_num + 1}": table for table_num, table in enumerate(tables)}
+    return None
+
+def extract_sheet(rows: Iterable[Sequence[Any]], max_edit_distance: int = LABEL_MAX_EDIT_DISTANCE,
+                  profile: Optional[Profile] = None) -> Optional[Union[List[float], Dict[str, List[float]]]]:
+    """
+    Extracts time stamp information from one sheet.
+
+    :param rows: Rows of raw cell values of the sheet.
+    :param max_edit_distance: Maximum edit distance at which misspelled labels still match, 0 to only match labels exactly.
+    :param profile: Profile to record the time spent on each stage and the cells scanned in, or None to not profile.
+    :return: Times of the only cue table in the sheet, times of each cue table keyed by "Part N" if there are several,
+    or None if the sheet has no cue tables.
+    """
+    return extract_sheet_with_formats(rows, max_edit_distance, profile)[0]
+
+def extract_sheet_with_formats(rows: Iterable[Sequence[Any]], max_edit_distance: int = LABEL_MAX_EDIT_DISTANCE,
+                               profile: Optional[Profile] = None) -> Tuple[Any, Any]:
+    """
+    Extracts time stamp information from one sheet, along with the format inferred for each cue table.
+
+    :param rows: Rows of raw cell values of the sheet.
+    :param max_edit_distance: Maximum edit distance at which misspelled labels still match, 0 to only match labels exactly.
+    :param profile: Profile to record the time spent on each stage and the cells scanned in, or None to not profile.
+    :return: Result of extract_sheet, and the time formats of the cue tables grouped the same way (see infer_time_format).
+    """
+    tables = list(iter_sheet_tables(rows, max_edit_distance, profile))
+    return group_cue_tables([times for _, times, _ in tables]), group_cue_tables([time_format for _, _, time_format in tables])
+
+def iter_sheet_tables(rows: Iterable[Sequence[Any]], max_edit_distance: int = LABEL_MAX_EDIT_DISTANCE,
+                      profile: Optional[Profile] = None) -> Iterator[Tuple[Optional[str], List[float], Optional[str]]]:
+    """
+    Extracts the cue tables of one sheet one at a time. The whole sheet is scanned before the first table is yielded,
+    since labels can be anywhere in it, but each table is only parsed once the previous one was consumed.
+
+    :param rows: Rows of raw cell values of the sheet.
+    :param max_edit_distance: Maximum edit distance at which misspelled labels still match, 0 to only match labels exactly.
+    :param profile: Profile to record the time spent on each stage and the cells scanned in, or None to not profile.
+    :return: Iterator over the "Part N" name of each cue table, or None if it is the only one of the sheet,
+    its times, and its time format (see infer_time_format), in the order of the tables.
+    """
+    with stage(profile, "label_search"):
+        # Streamed rows are read while the sheet is scanned, so reading them is timed separately.
+        index, columns = scan_sheet(timed(profile, rows, "load", "cells_scanned", len), max_edit_distance)
+        regions = [region for region in detect_table_regions(index, columns, max_edit_distance) if not region.is_example]
+    count(profile, "tables", len(regions))
+
+    for region_num, region in enumerate(regions):
+        with stage(profile, "time_parsing"):
+            times, time_format = parse_time_column(region.cells)
+        count(profile, "times_parsed", len(times))
+        yield f"Part {region_num + 1}" if len(regions) > 1 else None, times, time_format
+
+def extract_sheet_profiled(rows: Sequence[Sequence[Any]],
+                           max_edit_distance: int = LABEL_MAX_EDIT_DISTANCE) -> Tuple[Any, Any, Profile]:
+    """
+    Extracts time stamp information from one sheet in a worker process, profiling it separately.
+
+    :param rows: Rows of raw cell values of the sheet.
+    :param max_edit_distance: Maximum edit distance at which misspelled labels still match, 0 to only match labels exactly.
+    :return: Result of extract_sheet_with_formats, and the profile of the extraction to be merged into the profile
+    of the main process.
+    """
+    profile = Profile()
+    return (*extract_sheet_with_formats(rows, max_edit_distance, profile), profile)
+
+def parser_config(reader: str = "pandas", max_edit_distance: int = LABEL_MAX_EDIT_DISTANCE) -> dict:
+    """
+    Returns the configuration the results of extract_tables depend on, to be used as part of cache keys.
+
+    :param reader: Name of the backend used to read the sheets (see EXCEL_READERS).
+    :param max_edit_distance: Maximum edit distance at which misspelled labels still match.
+    :return: Parser configuration.
+    """
+    return {
+        "version": PARSER_VERSION,
+        "reader": reader,
+        "cue_time_labels": CUE_TIME_LABELS,
+        "example_labels": EXAMPLE_LABELS,
+        "empty_time_cell_tolerance": EMPTY_TIME_CELL_TOLERANCE,
+        "max_edit_distance": max_edit_distance,
+    }
+
+def extract_sheets(excel_file: str, reader: str = "pandas", max_edit_distance: int = LABEL_MAX_EDIT_DISTANCE,
+                   workers: int = 1, sheet_names: Optional[Collection[str]] = None, profile: Optional[Profile] = None,
+                   time_formats: Optional[dict] = None) -> Dict[str, Optional[Union[List[float], Dict[str, List[float]]]]]:
+    """
+    Extracts time stamp information from the sheets in the Excel file, including the sheets without cue tables.
+    With several workers, the workbook is still read once, then the sheets are extracted in a pool of processes
+    and the results are put back in the order of the sheets.
+
+    :param excel_file: Excel file path.
+    :param reader: Name of the backend used to read the sheets (see EXCEL_READERS).
+    :param max_edit_distance: Maximum edit distance at which misspelled labels still match, 0 to only match labels exactly.
+    :param workers: Number of processes extracting sheets in parallel, 1 to extract them one by one.
+    :param sheet_names: Names of the sheets to extract, or None to extract all sheets.
+    :param profile: Profile to record the time spent on each stage and the work done in, or None to not profile.
+    With several workers, the times spent by all workers are added up.
+    :param time_formats: Dictionary to add the time formats of the cue tables of each sheet with cue tables to,
+    grouped the same way as its time stamps (see infer_time_format), or None to not report them.
+    :return: Result of extract_sheet for each sheet keyed by sheet name, in the workbook order.
+    :raises: ValueError if the reader is unknown.
+    """
+    if reader not in EXCEL_READERS:
+        raise ValueError(f"Unknown Excel reader: {reader}.")
+
+    sheets = timed(profile, EXCEL_READERS[reader](excel_file, sheet_names), "load", "sheets")
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        # Streamed rows cannot be sent to other processes, so each sheet is collected first.
+        with stage(profile, "load"):
+            sheets = [(sheet_name, [tuple(str(cell) if isinstance(cell, SharedString) else cell for cell in row) for row in rows])
+                      for sheet_name, rows in sheets]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            all_rows = [rows for _, rows in sheets]
+            if profile is None:
+                results = list(executor.map(extract_sheet_with_formats, all_rows, repeat(max_edit_distance)))
+            else:
+                results = []
+                for cue_group, format_group, worker_profile in executor.map(extract_sheet_profiled, all_rows,
+                                                                            repeat(max_edit_distance)):
+                    results.append((cue_group, format_group))
+                    profile.merge(worker_profile)
+        sheets = [(sheet_name, result) for (sheet_name, _), result in zip(sheets, results)]
+    else:
+        sheets = ((sheet_name, extract_sheet_with_formats(rows, max_edit_distance, profile=profile)) for sheet_name, rows in sheets)
+
+    cue_groups = dict()
+    for sheet_name, (cue_group, format_group) in sheets:
+        cue_groups[sheet_name] = cue_group
+        if time_formats is not None and cue_group is not None:
+            time_formats[sheet_name] = format_group
+    return cue_groups
+
+def extract_changed_tables(excel_file: str, cache: ParseCache, reader: str = "pandas",
+                           max_edit_distance: int = LABEL_MAX_EDIT_DISTANCE, workers: int = 1,
+                           profile: Optional[Profile] = None, time_formats: Optional[dict] = None) -> Tuple[dict, List[str]]:
+    """
+    Extracts time stamp information from all sheets in the Excel file, reusing cached results wherever possible.
+    If the whole workbook was parsed before, its cached result is returned. Otherwise, only the sheets whose
+    fingerprint changed since the workbook at this path was last parsed are extracted again.
+
+    :param excel_file: Excel file path.
+    :param cache: Cache to look the results up in and store them to.
+    :param reader: Name of the backend used to read the sheets (see EXCEL_READERS).
+    :param max_edit_distance: Maximum edit distance at which misspelled labels still match, 0 to only match labels exactly.
+    :param workers: Number of processes extracting sheets in parallel, 1 to extract them one by one.
+    :param profile: Profile to record the time spent on each stage and the work done in, or None to not profile.
+    :param time_formats: Dictionary to add the time formats of the cue tables to (see extract_sheets), or None to not report them.
+    :return: Time stamp information extracted from all sheets, and the names of the groups
+    whose cues changed since the workbook at this path was last parsed, in the workbook order.
+    :raises: ValueError if the reader is unknown.
+    """
+    config = parser_config(reader, max_edit_distance)
+    with stage(profile, "cache"):
+        fingerprints = sheet_fingerprints(excel_file)
+        previous_sheets = cache.get_sheets(excel_file, config) or {"fingerprints": dict(), "groups": dict(), "time_formats": dict()}
+        cached = cache.get(excel_file, config)
+    count(profile, "cache_hits", int(cached is not None))
+
+    # The formats are cached with the time stamps of this exact content, since the per-sheet results of the path
+    # may belong to another version of the workbook.
+    format_groups = dict(cached["time_formats"]) if cached is not None else dict()
+    if cached is not None and fingerprints is not None:
+        cue_groups = {sheet_name: cached["time_stamps"].get(sheet_name) for sheet_name in fingerprints}
+    elif fingerprints is not None:
+        changed_sheets = [sheet_name for sheet_name, fingerprint in fingerprints.items()
+                          if previous_sheets["fingerprints"].get(sheet_name) != fingerprint
+                          or sheet_name not in previous_sheets["groups"]]
+        count(profile, "sheet_cache_hits", len(fingerprints) - len(changed_sheets))
+        cue_groups = extract_sheets(excel_file, reader, max_edit_distance, workers, changed_sheets, profile,
+                                    format_groups) if changed_sheets else dict()
+        cue_groups = {sheet_name: cue_groups[sheet_name] if sheet_name in cue_groups else previous_sheets["groups"][sheet_name]
+                      for sheet_name in fingerprints}
+        format_groups = {sheet_name: format_groups[sheet_name] if sheet_name in format_groups
+                         else previous_sheets["time_formats"].get(sheet_name)
+                         for sheet_name in fingerprints if cue_groups[sheet_name] is not None}
+    else:
+        # Not an xlsx archive, so there is nothing to fingerprint the sheets with.
+        cue_groups = cached["time_stamps"] if cached is not None else extract_sheets(excel_file, reader, max_edit_distance, workers,
+                                                                                     profile=profile, time_formats=format_groups)
+        fingerprints = dict()
+
+    time_stamps = {group_name: cue_group for group_name, cue_group in cue_groups.items() if cue_group is not None}
+    changed_groups = [group_name for group_name in time_stamps
+                      if previous_sheets["groups"].get(group_name) != time_stamps[group_name]]
+    if time_formats is not None:
+        time_formats.update(format_groups)
+
+    with stage(profile, "cache"):
+        cache.put(excel_file, config, {"time_stamps": time_stamps, "time_formats": format_groups})
+        if fingerprints:
+            cache.put_sheets(excel_file, config, {"fingerprints": fingerprints, "groups": cue_groups,
+                                                  "time_formats": format_groups})
+
+    return time_stamps, changed_groups
+
+def extract_tables(excel_file: str, reader: str = "pandas", max_edit_distance: int = LABEL_MAX_EDIT_DISTANCE,
+                   workers: int = 1, cache: Optional[ParseCache] = None, profile: Optional[Profile] = None,
+                   time_formats: Optional[dict] = None) -> [List[List[str]]]:
     """
     Extracts time stamp information from all sheets in the Excel file to be used in QLab.
+    Each sheet is loaded into memory once and scanned in a single pass; nothing is written to disk.
 
     :param excel_file: Excel file path.
+    :param reader: Name of the backend used to read the sheets (see EXCEL_READERS).
+    :param max_edit_distance: Maximum edit distance at which misspelled labels still match, 0 to only match labels exactly.
+    :param workers: Number of processes extracting sheets in parallel, 1 to extract them one by one.
+    :param cache: Cache to look the results up in and store them to, or None to always parse the workbook.
+    :param profile: Profile to record the time spent on each stage and the work done in, or None to not profile.
+    :param time_formats: Dictionary to add the time formats of the cue tables of each group to, grouped the same way as
+    the time stamps (see infer_time_format), or None to not report them.
     :return: List of time stamp information extracted from all sheets.
+    :raises: ValueError if the reader is unknown.
+    """
+    if cache is not None:
+        return extract_changed_tables(excel_file, cache, reader, max_edit_distance, workers, profile, time_formats)[0]
+
+    cue_groups = extract_sheets(excel_file, reader, max_edit_distance, workers, profile=profile, time_formats=time_formats)
+    return {group_name: cue_group for group_name, cue_group in cue_groups.items() if cue_group is not None}
+
+def iter_tables(excel_file: str, reader: str = "pandas", max_edit_distance: int = LABEL_MAX_EDIT_DISTANCE,
+                profile: Optional[Profile] = None) -> Iterator[Tuple[Tuple[str, ...], List[float]]]:
     """
-    time_stamps = dict()
+    Extracts time stamp information from all sheets in the Excel file, yielding each cue table as soon as it is parsed,
+    so that its cues can be written to QLab while the rest of the workbook is still being parsed.
 
-    csv_files = save_excel_sheets_as_csv(excel_file)
-    for csv_file in csv_files:
-        group_name = csv_file.split(".csv")[0]
-        cue_groups = []
-        found_time_cells = find_first_cell_occurrences(csv_file, CUE_TIME_LABELS)
-        found_example_cells = find_first_cell_occurrences(csv_file, EXAMPLE_LABELS)
+    :param excel_file: Excel file path.
+    :param reader: Name of the backend used to read the sheets (see EXCEL_READERS).
+    :param max_edit_distance: Maximum edit distance at which misspelled labels still match, 0 to only match labels exactly.
+    :param profile: Profile to record the time spent on each stage and the work done in, or None to not profile.
+    :return: Iterator over the names of the groups holding each cue table, outermost first, and its times,
+    in the same order as the cues of extract_tables.
+    :raises: ValueError if the reader is unknown.
+    """
+    if reader not in EXCEL_READERS:
+        raise ValueError(f"Unknown Excel reader: {reader}.")
 
-        found_time_cells = remove_example_tables(found_time_cells, found_example_cells)
+    for sheet_name, rows in timed(profile, EXCEL_READERS[reader](excel_file), "load", "sheets"):
+        for part_name, times, _ in iter_sheet_tables(rows, max_edit_distance, profile=profile):
+            yield (sheet_name,) if part_name is None else (sheet_name, part_name), times
 
-        #TODO: skip typos
+def extract_workbook(excel_file: str, reader: str = "pandas", max_edit_distance: int = LABEL_MAX_EDIT_DISTANCE,
+                     workers: int = 1, cache: Optional[ParseCache] = None, profile: Optional[Profile] = None) -> CueWorkbook:
+    """
+    Extracts time stamp information from all sheets in the Excel file into a compact CueWorkbook,
+    along with the time format of each cue table.
 
-        if len(found_time_cells) > 1:
-            time_stamps[group_name] = dict()
-        for found_cell_num, found_cell in enumerate(found_time_cells):
-            extracted_times = parse_times(csv_file, found_cell)
-            extracted_times = [time for time in extracted_times if time is not None]
-            cue_groups.append(extracted_times)
-            if len(found_time_cells) == 1:
-                time_stamps[group_name] = extracted_times
-            else:
-                time_stamps[group_name][f"Part {found_cell_num + 1}"] = extracted_times
+    :param excel_file: Excel file path.
+    :param reader: Name of the backend used to read the sheets (see EXCEL_READERS).
+    :param max_edit_distance: Maximum edit distance at which misspelled labels still match, 0 to only match labels exactly.
+    :param workers: Number of processes extracting sheets in parallel, 1 to extract them one by one.
+    :param cache: Cache to look the results up in and store them to, or None to always parse the workbook.
+    :param profile: Profile to record the time spent on each stage and the work done in, or None to not profile.
+    :return: Cue tables extracted from all sheets, named after the file.
+    :raises: ValueError if the reader is unknown.
+    """
+    if cache is not None or workers > 1:
+        # The cache and the worker processes hold results as dictionaries, so the workbook is converted from them.
+        time_formats = dict()
+        time_stamps = extract_tables(excel_file, reader, max_edit_distance, workers, cache, profile, time_formats)
+        return CueWorkbook.from_dict(time_stamps, time_formats, os.path.basename(excel_file))
 
-        try:
-            os.remove(csv_file)
-        except FileNotFoundError:
-            pass
+    if reader not in EXCEL_READERS:
+        raise ValueError(f"Unknown Excel reader: {reader}.")
 
-    return time_stamps
+    # Each cue table is stored as soon as it is parsed, so the times of the whole workbook are never held as lists.
+    workbook = CueWorkbook(os.path.basename(excel_file))
+    for sheet_name, rows in timed(profile, EXCEL_READERS[reader](excel_file), "load", "sheets"):
+        tables = [CueTable(part_name, array("d", times), time_format)
+                  for part_name, times, time_format in iter_sheet_tables(rows, max_edit_distance, profile=profile)]
+        if tables:
+            workbook.sheets.append(CueSheet(sheet_name, tables))
+    return workbook
 
 def sanitize_filepath(filepath: str) -> str:
     """
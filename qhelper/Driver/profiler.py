@@ -0,0 +1,138 @@
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import Callable, ContextManager, Dict, Iterable, Iterator, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+@dataclass
+class Profile():
+    """
+    Time spent in each stage of parsing a workbook and pushing it to QLab, and counters of the work done.
+    Stages can be nested, in which case the time spent in the inner stage is not counted for the outer one,
+    so the times of all stages add up to the total time profiled.
+
+    The functions of this module accept None instead of a profile and then do nothing,
+    so that code that is not being profiled does not pay for the timers.
+    """
+
+    seconds: Dict[str, float] = field(default_factory=dict)
+    counters: Dict[str, int] = field(default_factory=dict)
+    nested_seconds: List[float] = field(default_factory=list)
+
+    def add_time(self, stage_name: str, seconds: float) -> None:
+        """
+        Adds time spent in a stage, discounting it from the stage it is nested in.
+
+        :param stage_name: Name of the stage.
+        :param seconds: Time spent in the stage.
+        """
+        self.seconds[stage_name] = self.seconds.get(stage_name, 0.0) + seconds
+        if self.nested_seconds:
+            self.nested_seconds[-1] += seconds
+
+    def merge(self, other: "Profile") -> None:
+        """
+        Adds the times and counters of another profile to this one, such as the profile of a worker process.
+        The times are not discounted from the current stage, since they were spent elsewhere.
+
+        :param other: Profile to add.
+        """
+        for stage_name, seconds in other.seconds.items():
+            self.seconds[stage_name] = self.seconds.get(stage_name, 0.0) + seconds
+        for counter_name, amount in other.counters.items():
+            self.counters[counter_name] = self.counters.get(counter_name, 0) + amount
+
+    def report(self) -> dict:
+        """
+        Returns the profile as a JSON-serializable report.
+
+        :return: Dictionary with the "seconds" spent in each stage and their "total", and the "counters".
+        """
+        return {
+            "seconds": {**self.seconds, "total": sum(self.seconds.values())},
+            "counters": dict(self.counters),
+        }
+
+def stage(profile: Optional[Profile], stage_name: str) -> ContextManager:
+    """
+    Times the code run inside the returned context manager as the given stage.
+
+    :param profile: Profile to record the time in, or None to not time anything.
+    :param stage_name: Name of the stage.
+    :return: Context manager timing the stage.
+    """
+    if profile is None:
+        return nullcontext()
+    return timed_stage(profile, stage_name)
+
+@contextmanager
+def timed_stage(profile: Profile, stage_name: str) -> Iterator[None]:
+    """
+    Times the code run inside the context manager as the given stage of the given profile.
+
+    :param profile: Profile to record the time in.
+    :param stage_name: Name of the stage.
+    """
+    start = time.perf_counter()
+    profile.nested_seconds.append(0.0)
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        nested_seconds = profile.nested_seconds.pop()
+        profile.add_time(stage_name, elapsed - nested_seconds)
+        # The enclosing stage must not count the stages nested in this one either.
+        if profile.nested_seconds:
+            profile.nested_seconds[-1] += nested_seconds
+
+def timed(profile: Optional[Profile], items: Iterable[T], stage_name: str, counter_name: Optional[str] = None,
+          size: Callable[[T], int] = lambda item: 1) -> Iterable[T]:
+    """
+    Times producing each item of an iterable as the given stage, such as reading the rows of a streamed sheet.
+
+    :param profile: Profile to record the time in, or None to not time anything.
+    :param items: Iterable to time.
+    :param stage_name: Name of the stage.
+    :param counter_name: Name of the counter to add the size of each item to, or None to not count the items.
+    :param size: Function returning the size of an item.
+    :return: Iterable over the same items.
+    """
+    if profile is None:
+        return items
+    return timed_items(profile, iter(items), stage_name, counter_name, size)
+
+def timed_items(profile: Profile, items: Iterator[T], stage_name: str, counter_name: Optional[str],
+                size: Callable[[T], int]) -> Iterator[T]:
+    """
+    Generator behind timed.
+
+    :param profile: Profile to record the time in.
+    :param items: Iterator to time.
+    :param stage_name: Name of the stage.
+    :param counter_name: Name of the counter to add the size of each item to, or None to not count the items.
+    :param size: Function returning the size of an item.
+    :return: Iterator over the same items.
+    """
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(items)
+        except StopIteration:
+            profile.add_time(stage_name, time.perf_counter() - start)
+            return
+        profile.add_time(stage_name, time.perf_counter() - start)
+        if counter_name is not None:
+            count(profile, counter_name, size(item))
+        yield item
+
+def count(profile: Optional[Profile], counter_name: str, amount: int = 1) -> None:
+    """
+    Adds to a counter.
+
+    :param profile: Profile holding the counter, or None to not count anything.
+    :param counter_name: Name of the counter.
+    :param amount: Amount to add.
+    """
+    if profile is not None:
+        profile.counters[counter_name] = profile.counters.get(counter_name, 0) + amount
@@ -0,0 +1,285 @@
+#!/usr/local/bin/python3.11
+
+import argparse
+import os
+import socket
+import socketserver
+import struct
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Iterable, Iterator, Optional
+
+from cache import ParseCache
+from client import deserialize, serialize
+from parser import extract_changed_tables, extract_tables, sanitize_filepath
+from utils import *
+
+# Unix domain socket the parse server listens on by default.
+DEFAULT_SOCKET_PATH = os.path.join(tempfile.gettempdir(), "qhelper.sock")
+
+# Each frame starts with the length of its JSON payload as a 4-byte big-endian unsigned integer.
+FRAME_HEADER = struct.Struct(">I")
+
+# Frames longer than this are rejected, so that a corrupt header cannot make the server allocate gigabytes.
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+# Kinds of jobs the server accepts.
+JOB_TYPES = {"parse", "push"}
+
+def write_frame(connection: socket.socket, message: Any) -> None:
+    """
+    Sends a message as one length-prefixed JSON frame.
+
+    :param connection: Connected socket.
+    :param message: JSON-serializable message.
+    """
+    payload = serialize(message)
+    connection.sendall(FRAME_HEADER.pack(len(payload)) + payload)
+
+def read_frame(connection: socket.socket) -> Optional[Any]:
+    """
+    Receives one length-prefixed JSON frame.
+
+    :param connection: Connected socket.
+    :return: Deserialized message, or None if the other end closed the connection between two frames.
+    :raises: ValueError if the frame is too long or its payload is not valid JSON.
+    :raises: ConnectionError if the connection is closed in the middle of a frame.
+    """
+    header = read_exactly(connection, FRAME_HEADER.size)
+    if header is None:
+        return None
+    (size,) = FRAME_HEADER.unpack(header)
+    if size > MAX_FRAME_SIZE:
+        raise ValueError(f"Frame of {size} bytes is longer than {MAX_FRAME_SIZE} bytes.")
+    payload = read_exactly(connection, size)
+    if payload is None:
+        raise ConnectionError("Connection closed in the middle of a frame.")
+    return deserialize(payload)
+
+def read_exactly(connection: socket.socket, size: int) -> Optional[bytes]:
+    """
+    Receives exactly the given number of bytes.
+
+    :param connection: Connected socket.
+    :param size: Number of bytes to receive.
+    :return: Received bytes, or None if the connection was closed before any byte was received.
+    :raises: ConnectionError if the connection is closed after only some of the bytes were received.
+    """
+    chunks = []
+    received = 0
+    while received < size:
+        chunk = connection.recv(min(size - received, 1024 * 1024))
+        if not chunk:
+            if received:
+                raise ConnectionError("Connection closed in the middle of a frame.")
+            return None
+        chunks.append(chunk)
+        received += len(chunk)
+    return b"".join(chunks)
+
+def parse_file(excel_file: str, reader: str = "pandas", use_cache: bool = True) -> dict:
+    """
+    Extracts time stamp information from an Excel file in a worker process of the server.
+
+    :param excel_file: Excel file path.
+    :param reader: Name of the backend used to read the sheets (see parser.EXCEL_READERS).
+    :param use_cache: Whether to reuse and store parse results in the cache.
+    :return: Extracted "time_stamps", their "time_formats", and the "changed_groups" since the file was last parsed,
+    which are all groups if the cache is not used.
+    """
+    time_formats = dict()
+    if use_cache:
+        time_stamps, changed_groups = extract_changed_tables(excel_file, ParseCache(), reader, time_formats=time_formats)
+    else:
+        time_stamps = extract_tables(excel_file, reader, time_formats=time_formats)
+        changed_groups = list(time_stamps)
+    return {"time_stamps": time_stamps, "time_formats": time_formats, "changed_groups": changed_groups}
+
+def warm_up() -> None:
+    """
+    Imports the heavy modules the parser defers in a worker process, so that the first job it runs does not pay for them.
+    """
+    import dateutil.parser
+    import numpy
+    import openpyxl
+    import pandas
+
+class ParseServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Long-lived parse server listening on a Unix domain socket, so that parsing a file costs no interpreter start-up
+    and no imports. Clients send jobs as length-prefixed JSON frames and may send several on one connection without
+    waiting. Jobs run concurrently and each result is sent back as soon as it is ready, tagged with the id of its job.
+
+    A job is {"id": ..., "type": "parse", "file": path} to extract the time stamps of a file (see parse_file), or
+    {"id": ..., "type": "push", "file": path, "workspace": name} to also write them to a QLab workspace.
+    Both accept "reader" and "use_cache", and push jobs accept "passcode", "changed_only" and "transport".
+    Results are {"id": ..., "status": "ok", "result": ...} or {"id": ..., "status": "error", "error": message}.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH, workers: Optional[int] = None):
+        """
+        Binds the server to its socket and starts its worker processes.
+
+        :param socket_path: Path of the Unix domain socket, replaced if a server that is no longer running left it behind.
+        :param workers: Number of worker processes parsing files, defaults to the number of CPUs.
+        :raises: RuntimeError if another server is already listening on the socket.
+        """
+        remove_stale_socket(socket_path)
+        super().__init__(socket_path, JobHandler)
+        self.workers = workers or os.cpu_count() or 1
+        self.parse_pool = self.start_parse_pool()
+        self.parse_pool_lock = threading.Lock()
+        self.job_pool = ThreadPoolExecutor()
+        # QLab commands act on the selected cue, so the cues of two files must never be written at the same time.
+        self.push_lock = threading.Lock()
+
+    def start_parse_pool(self) -> ProcessPoolExecutor:
+        """
+        Starts the worker processes parsing files and waits until they have imported the parser's dependencies.
+
+        :return: Pool of the worker processes.
+        """
+        parse_pool = ProcessPoolExecutor(max_workers=self.workers)
+        wait([parse_pool.submit(warm_up) for _ in range(self.workers)])
+        return parse_pool
+
+    def parse(self, excel_file: str, reader: str, use_cache: bool) -> dict:
+        """
+        Parses a file in a worker process (see parse_file).
+        If a worker process dies, the pool it belonged to is replaced, and the file is parsed again in a process of
+        its own, since the job that killed the worker may have been another one. Only a file that also kills its own
+        process fails, and the jobs after it run on the new pool.
+
+        :param excel_file: Excel file path.
+        :param reader: Name of the backend used to read the sheets (see parser.EXCEL_READERS).
+        :param use_cache: Whether to reuse and store parse results in the cache.
+        :return: Result of parse_file.
+        :raises: BrokenProcessPool if parsing the file kills the process parsing it.
+        """
+        parse_pool = self.parse_pool
+        try:
+            return parse_pool.submit(parse_file, excel_file, reader, use_cache).result()
+        except BrokenProcessPool:
+            with self.parse_pool_lock:
+                # Other jobs running on the broken pool fail at the same time, and only the first replaces it.
+                if self.parse_pool is parse_pool:
+                    parse_pool.shutdown(wait=False)
+                    self.parse_pool = self.start_parse_pool()
+        with ProcessPoolExecutor(max_workers=1) as isolated_pool:
+            return isolated_pool.submit(parse_file, excel_file, reader, use_cache).result()
+
+    def run_job(self, job: Any) -> dict:
+        """
+        Runs one job and builds its result.
+
+        :param job: Job received from a client.
+        :return: Result to send back, never raising so that a failing job does not affect the others.
+        """
+        job_id = job.get("id") if isinstance(job, dict) else None
+        try:
+            if not isinstance(job, dict) or job.get("type") not in JOB_TYPES:
+                raise ValueError(f"Unknown job: {job!r}.")
+            excel_file = sanitize_filepath(job["file"])
+            parsed = self.parse(excel_file, job.get("reader", "pandas"), job.get("use_cache", True))
+            if job["type"] == "parse":
+                return {"id": job_id, "status": "ok", "result": parsed}
+
+            from driver import push_cues
+
+            cue_dict = parsed["time_stamps"]
+            if job.get("changed_only", False):
+                cue_dict = {group_name: cue_dict[group_name] for group_name in parsed["changed_groups"]}
+            with self.push_lock:
+                push_cues(cue_dict, job["workspace"], job.get("passcode", ""), transport=job.get("transport", "udp"))
+            return {"id": job_id, "status": "ok", "result": {"groups": list(cue_dict)}}
+        except Exception as e:
+            return {"id": job_id, "status": "error", "error": f"{type(e).__name__}: {e}"}
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.job_pool.shutdown()
+        self.parse_pool.shutdown()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+class JobHandler(socketserver.BaseRequestHandler):
+    """
+    Handles one client connection: reads jobs until the client stops sending, runs them on the server,
+    and sends their results back in the order they finish. The connection is closed once every result is sent.
+    """
+
+    def handle(self) -> None:
+        send_lock = threading.Lock()
+        pending = []
+
+        def reply(job: Any) -> None:
+            result = self.server.run_job(job)
+            with send_lock:
+                write_frame(self.request, result)
+
+        try:
+            while (job := read_frame(self.request)) is not None:
+                pending.append(self.server.job_pool.submit(reply, job))
+        except (ValueError, ConnectionError) as e:
+            # The stream cannot be resynchronized after a bad frame, so the jobs already read are finished and the rest dropped.
+            wait(pending)
+            with send_lock:
+                write_frame(self.request, {"id": None, "status": "error", "error": f"{type(e).__name__}: {e}"})
+            return
+        wait(pending)
+
+def remove_stale_socket(socket_path: str) -> None:
+    """
+    Removes the socket file a server that is no longer running left behind.
+
+    :param socket_path: Path of the Unix domain socket.
+    :raises: RuntimeError if a server is still listening on the socket.
+    """
+    if not os.path.exists(socket_path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(socket_path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.unlink(socket_path)
+            return
+    raise RuntimeError(SERVER_ALREADY_RUNNING_MESSAGE.format(path=socket_path))
+
+def submit_jobs(jobs: Iterable[dict], socket_path: str = DEFAULT_SOCKET_PATH) -> Iterator[dict]:
+    """
+    Sends jobs to a running parse server on one connection and yields their results as they arrive.
+
+    :param jobs: Jobs to run (see ParseServer). Jobs without an id are given their position as id.
+    Relative file paths are made absolute, since the server resolves them against its own working directory.
+    :param socket_path: Path of the Unix domain socket of the server.
+    :return: Iterator over the results of the jobs, in the order they finish.
+    :raises: ConnectionError if the server is not running.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_path)
+        for job_num, job in enumerate(jobs):
+            if "file" in job:
+                job = {**job, "file": os.path.abspath(sanitize_filepath(job["file"]))}
+            write_frame(connection, {"id": job_num, **job})
+        # Tells the server that no more jobs are coming, so that it closes the connection after the last result.
+        connection.shutdown(socket.SHUT_WR)
+        while (result := read_frame(connection)) is not None:
+            yield result
+
+
+if __name__ == "__main__":
+    argument_parser = argparse.ArgumentParser(description="Runs the parse server on a Unix domain socket.")
+    argument_parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help="Path of the Unix domain socket.")
+    argument_parser.add_argument("--workers", type=int, default=None, help="Number of worker processes parsing files.")
+    arguments = argument_parser.parse_args()
+
+    with ParseServer(arguments.socket, arguments.workers) as server:
+        print(SERVER_LISTENING_MESSAGE.format(path=arguments.socket), flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
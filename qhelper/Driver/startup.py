@@ -0,0 +1,72 @@
+#!/usr/local/bin/python3.11
+
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+# Heavy modules that must only be imported once the code path needing them runs, not when the driver starts.
+DEFERRED_MODULES = ["pandas", "numpy", "openpyxl", "dateutil", "pythonosc", "asyncio"]
+
+# Maximum cumulative time in milliseconds importing the driver may take on a cold start.
+IMPORT_TIME_BUDGET_MS = 150
+
+# The import time is measured this many times and the fastest run is compared to the budget, to reduce noise.
+IMPORT_TIME_RUNS = 3
+
+def measure_import_times(module: str) -> Dict[str, int]:
+    """
+    Imports a module in a fresh interpreter run with -X importtime and collects the reported import times.
+
+    :param module: Name of the module to import from the Driver directory.
+    :return: Cumulative import time of every module imported along the way in microseconds, keyed by module name.
+    :raises: subprocess.CalledProcessError if the module cannot be imported.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True)
+
+    import_times = dict()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative_time, module_name = line[len("import time:"):].split("|")
+        # Skips the header line of the report.
+        if cumulative_time.strip().isdigit():
+            import_times[module_name.strip()] = int(cumulative_time)
+    return import_times
+
+def check_import_budget(module: str = "driver", budget_ms: int = IMPORT_TIME_BUDGET_MS,
+                        runs: int = IMPORT_TIME_RUNS) -> List[str]:
+    """
+    Checks that importing a module stays within the import time budget and does not import any of DEFERRED_MODULES.
+
+    :param module: Name of the module to import from the Driver directory.
+    :param budget_ms: Maximum cumulative import time of the module in milliseconds.
+    :param runs: Number of times the import time is measured.
+    :return: Descriptions of the violations found, empty if there are none.
+    """
+    violations = []
+    measurements = [measure_import_times(module) for _ in range(runs)]
+
+    fastest_ms = min(import_times[module] for import_times in measurements) / 1000
+    if fastest_ms > budget_ms:
+        violations.append(f"Importing {module} took {fastest_ms:.1f} ms, over the budget of {budget_ms} ms.")
+
+    for deferred_module in DEFERRED_MODULES:
+        if deferred_module in measurements[0]:
+            violations.append(f"Importing {module} imports {deferred_module}, which should be deferred.")
+
+    return violations
+
+
+if __name__ == "__main__":
+    argument_parser = argparse.ArgumentParser(description="Fails if the cold start import time of a Driver module regresses.")
+    argument_parser.add_argument("module", nargs="?", default="driver", help="Module to import.")
+    argument_parser.add_argument("--budget", type=int, default=IMPORT_TIME_BUDGET_MS, help="Import time budget in milliseconds.")
+    arguments = argument_parser.parse_args()
+
+    violations = check_import_budget(arguments.module, arguments.budget)
+    for violation in violations:
+        print(violation)
+    sys.exit(1 if violations else 0)
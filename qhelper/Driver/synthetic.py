@@ -0,0 +1,176 @@
+#!/usr/local/bin/python3.11
+
+import argparse
+import datetime
+import json
+import os
+import random
+from itertools import zip_longest
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from parser import CUE_TIME_LABELS, EXAMPLE_LABELS
+
+# Ways a cue time can be written in the time column of a generated cue sheet.
+TIME_FORMATS = ["minutes", "fraction", "clock", "annotated", "native"]
+
+# Text of the description and junk cells. None of it looks like a label or a time stamp.
+JUNK_TEXT = ["Lights up", "Blackout", "Spot on soloist", "Fade to blue", "Full wash", "TBD", "see notes", "House to half",
+             "Strobe", "Slow fade", "?", "Hold"]
+
+# Number of cues in each example table.
+EXAMPLE_TABLE_CUES = 3
+
+# Number of columns taken by the example forms placed beside the cue tables, including the blank columns after them.
+SIDE_BY_SIDE_FORM_WIDTH = 8
+
+def format_cue_time(rng: random.Random, time_formats: Sequence[str]) -> Tuple[Any, float]:
+    """
+    Generates a random non-zero cue time in one of the given formats.
+
+    :param rng: Random number generator.
+    :param time_formats: Formats to pick from (see TIME_FORMATS).
+    :return: Cell value of the cue time, and the number of seconds extract_tables reads from it.
+    """
+    time_format = rng.choice(time_formats)
+    # Clock times and native Excel times are read as MM:SS with the hours as minutes, so they cannot go past 23 minutes.
+    minutes = rng.randint(0, 23 if time_format in ("clock", "native") else 59)
+    seconds = rng.randint(0 if minutes else 1, 59)
+
+    if time_format == "fraction":
+        fraction = rng.randint(0, 99)
+        return f"{minutes:02d}:{seconds:02d}.{fraction:02d}", float(f"{seconds:02d}.{fraction:02d}") + float(minutes) * 60
+    if time_format == "clock":
+        return f"{minutes}:{seconds:02d}:00", float(seconds) + float(minutes) * 60
+    if time_format == "annotated":
+        return f"{minutes}:{seconds:02d} - {rng.choice(JUNK_TEXT)}", float(seconds) + float(minutes) * 60
+    if time_format == "native":
+        return datetime.time(minutes, seconds), float(seconds) + float(minutes) * 60
+    return f"{minutes}:{seconds:02d}", float(seconds) + float(minutes) * 60
+
+def generate_sheet(rng: random.Random, tables: int, rows: int, example_blocks: int, junk: float,
+                   time_formats: Sequence[str], side_by_side: bool = False) -> Tuple[List[List[Any]], Optional[Union[List[float], Dict[str, List[float]]]]]:
+    """
+    Generates the rows of one cue sheet: example blocks first, then the cue tables, separated by blank rows,
+    with junk cells scattered to the right of the tables.
+
+    :param rng: Random number generator.
+    :param tables: Number of cue tables.
+    :param rows: Number of cues in each cue table.
+    :param example_blocks: Number of example forms, each with its own example table.
+    :param junk: Probability of a junk cell next to each row.
+    :param time_formats: Formats the cue times are written in (see TIME_FORMATS).
+    :param side_by_side: Whether to place the example blocks left of the cue tables rather than above them,
+    with the first cue table starting above the first example table.
+    :return: Rows of the sheet, and the time stamps extract_tables is expected to find in it.
+    """
+    label = rng.choice(CUE_TIME_LABELS)
+    offset = [None] * rng.randint(0, 3)
+    sheet_rows = []
+    cue_groups = []
+
+    def add_row(cells: List[Any], junk_cells: bool = True) -> None:
+        if junk_cells and rng.random() < junk:
+            cells = cells + [None] * rng.randint(1, 3) + [rng.choice(JUNK_TEXT + [rng.randint(1, 999)])]
+        sheet_rows.append(cells)
+
+    def add_table(cues: int, junk_cells: bool = True) -> List[float]:
+        times = []
+        add_row(offset + ["Cue", "Description", label, "Notes"], junk_cells)
+        for cue_num in range(cues):
+            cell, seconds = format_cue_time(rng, time_formats)
+            times.append(seconds)
+            add_row(offset + [cue_num + 1, rng.choice(JUNK_TEXT), cell, rng.choice([None, rng.choice(JUNK_TEXT)])], junk_cells)
+        for _ in range(rng.randint(3, 5)):
+            add_row([], junk_cells)
+        return times
+
+    # Junk cells next to example forms placed beside the cue tables would land in the cue tables.
+    for _ in range(example_blocks):
+        add_row(offset + [rng.choice(EXAMPLE_LABELS)], not side_by_side)
+        if side_by_side:
+            add_row([], False)
+        add_table(EXAMPLE_TABLE_CUES, not side_by_side)
+    if side_by_side:
+        example_rows, sheet_rows = sheet_rows, [[]]
+    for _ in range(tables):
+        cue_groups.append(add_table(rows))
+    if side_by_side:
+        sheet_rows = [(example_row + [None] * SIDE_BY_SIDE_FORM_WIDTH)[:SIDE_BY_SIDE_FORM_WIDTH] + table_row
+                      for example_row, table_row in zip_longest(example_rows, sheet_rows, fillvalue=[])]
+
+    if len(cue_groups) == 1:
+        return sheet_rows, cue_groups[0]
+    if cue_groups:
+        return sheet_rows, {f"Part {cue_group_num + 1}": cue_group for cue_group_num, cue_group in enumerate(cue_groups)}
+    return sheet_rows, None
+
+def generate_workbook(excel_file: str, sheets: int = 3, tables: int = 2, rows: int = 50, example_blocks: int = 1,
+                      junk: float = 0.3, time_formats: Sequence[str] = TIME_FORMATS, seed: int = 0,
+                      side_by_side: bool = False) -> dict:
+    """
+    Writes a realistic synthetic cue sheet workbook.
+
+    :param excel_file: Path of the xlsx file to write.
+    :param sheets: Number of sheets.
+    :param tables: Number of cue tables per sheet.
+    :param rows: Number of cues in each cue table.
+    :param example_blocks: Number of example forms per sheet.
+    :param junk: Probability of a junk cell next to each row.
+    :param time_formats: Formats the cue times are written in (see TIME_FORMATS).
+    :param seed: Seed of the random number generator, so that the same arguments always give the same workbook.
+    :param side_by_side: Whether to place the example forms beside the cue tables rather than above them.
+    :return: Time stamps extract_tables is expected to find in the workbook.
+    """
+    import openpyxl
+
+    rng = random.Random(seed)
+    workbook = openpyxl.Workbook(write_only=True)
+    time_stamps = dict()
+
+    for sheet_num in range(sheets):
+        sheet_name = f"Sheet {sheet_num + 1}"
+        sheet_rows, cue_group = generate_sheet(rng, tables, rows, example_blocks, junk, time_formats, side_by_side)
+        worksheet = workbook.create_sheet(sheet_name)
+        for row in sheet_rows:
+            worksheet.append(row)
+        if cue_group is not None:
+            time_stamps[sheet_name] = cue_group
+
+    workbook.save(excel_file)
+    return time_stamps
+
+def generate_corpus(directory: str, workbooks: int = 5, seed: int = 0, **scale: Any) -> Dict[str, dict]:
+    """
+    Writes several synthetic cue sheet workbooks into a directory.
+
+    :param directory: Directory to write the workbooks to, created if missing.
+    :param workbooks: Number of workbooks.
+    :param seed: Seed of the first workbook, the following ones use the next seeds.
+    :param scale: Arguments passed on to generate_workbook.
+    :return: Time stamps extract_tables is expected to find in each workbook, keyed by file path.
+    """
+    os.makedirs(directory, exist_ok=True)
+    corpus = dict()
+    for workbook_num in range(workbooks):
+        excel_file = os.path.join(directory, f"synthetic-{seed + workbook_num}.xlsx")
+        corpus[excel_file] = generate_workbook(excel_file, seed=seed + workbook_num, **scale)
+    return corpus
+
+
+if __name__ == "__main__":
+    argument_parser = argparse.ArgumentParser(description="Generates synthetic cue sheet workbooks and prints the expected time stamps.")
+    argument_parser.add_argument("directory", help="Directory to write the workbooks to.")
+    argument_parser.add_argument("--workbooks", type=int, default=5, help="Number of workbooks.")
+    argument_parser.add_argument("--sheets", type=int, default=3, help="Number of sheets per workbook.")
+    argument_parser.add_argument("--tables", type=int, default=2, help="Number of cue tables per sheet.")
+    argument_parser.add_argument("--rows", type=int, default=50, help="Number of cues per table.")
+    argument_parser.add_argument("--examples", type=int, default=1, help="Number of example forms per sheet.")
+    argument_parser.add_argument("--junk", type=float, default=0.3, help="Probability of a junk cell next to each row.")
+    argument_parser.add_argument("--seed", type=int, default=0, help="Seed of the first workbook.")
+    argument_parser.add_argument("--side-by-side", action="store_true", help="Place the example forms beside the cue tables.")
+    arguments = argument_parser.parse_args()
+
+    corpus = generate_corpus(arguments.directory, arguments.workbooks, arguments.seed, sheets=arguments.sheets,
+                             tables=arguments.tables, rows=arguments.rows, example_blocks=arguments.examples,
+                             junk=arguments.junk, side_by_side=arguments.side_by_side)
+    print(json.dumps(corpus))
@@ -0,0 +1,226 @@
+import json
+import socket
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Deque, Iterator, List, Optional, Union
+
+from utils import *
+
+# pythonosc pulls in asyncio, so it is only imported once a connection is opened.
+if TYPE_CHECKING:
+    from pythonosc import osc_bundle, osc_message
+
+# Number of bytes read from the socket at once when reading replies.
+RECEIVE_CHUNK_SIZE = 64 * 1024
+
+@dataclass
+class TCPTransport():
+    """
+    Persistent TCP connection to QLab sending OSC messages and bundles framed with SLIP, as OSC 1.1 over TCP requires.
+    Messages are pipelined: sending one never waits for the reply to the previous ones, which a background thread reads
+    as they arrive so that QLab is never blocked on a full connection.
+    QLab is asked to reply to every message, and the messages it has not replied to yet are kept as pending.
+    If the connection drops, it is opened again on the next send, the session messages (such as connecting to
+    the workspace with its pass code) are sent again first, since QLab ties them to the connection,
+    and the pending messages are sent again after them, in order, so that none of the messages lost with the
+    connection is skipped. A message QLab ran but whose reply was lost with the connection is run twice.
+
+    Has the same send method as pythonosc's SimpleUDPClient, so that Client can use either.
+    """
+
+    host: str = DEFAULT_HOST
+    port: int = DEFAULT_LISTENING_PORT
+    timeout: float = MAX_RESPONSE_TIME
+    session_messages: List["osc_message.OscMessage"] = field(default_factory=list)
+    pending: Deque["osc_message.OscMessage"] = field(default_factory=deque)
+    connection: Optional[socket.socket] = field(default=None, repr=False)
+    reader: Optional[threading.Thread] = field(default=None, repr=False)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    # Guards only self.pending, so that reading replies never waits for a send blocked on a full connection.
+    pending_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def connect(self) -> None:
+        """
+        Opens the connection to QLab if it is not open, then sends the session messages
+        and the pending messages again if it was open before.
+
+        :mutates: self.connection and self.reader to hold the open connection and the thread reading its replies.
+        :raises: ConnectionError if the connection cannot be opened or the messages cannot be sent again.
+        """
+        with self.lock:
+            self.connect_unlocked()
+
+    def connect_unlocked(self) -> None:
+        """
+        Body of connect, called with the lock held.
+
+        :mutates: self.pending to hold the session messages and the pending messages, sent again in that order.
+        :raises: ConnectionError if the connection cannot be opened or the messages cannot be sent again.
+        """
+        from pythonosc import osc_message_builder
+
+        if self.connection is not None:
+            return
+        try:
+            connection = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        except OSError as e:
+            raise ConnectionError(CONNECTION_FAILURE_MESSAGE.format(port=self.port)) from e
+        # Each message is written as soon as it is sent, rather than held back to be merged with the next ones.
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        connection.settimeout(None)
+        self.connection = connection
+        self.reader = threading.Thread(target=self.read_replies, args=(connection,), daemon=True)
+        self.reader.start()
+        # A pending session message is sent again anyway, before the other pending messages.
+        session_dgrams = {message.dgram for message in self.session_messages}
+        with self.pending_lock:
+            self.pending = deque(self.session_messages + [message for message in self.pending
+                                                          if message.dgram not in session_dgrams])
+            messages = list(self.pending)
+        always_reply = osc_message_builder.OscMessageBuilder(address=ALWAYS_REPLY)
+        always_reply.add_arg(1)
+        try:
+            self.write(always_reply.build())
+            for message in messages:
+                self.write(message)
+        except OSError as e:
+            self.drop(connection)
+            raise ConnectionError(CONNECTION_LOST_MESSAGE) from e
+
+    def send(self, content: Union["osc_message.OscMessage", "osc_bundle.OscBundle"]) -> None:
+        """
+        Sends an OSC message or bundle without waiting for its reply, reconnecting once if the connection dropped.
+        Its messages are pending until QLab replies to them.
+
+        :param content: Message or bundle to send.
+        :mutates: self.pending to hold the messages of the content.
+        :raises: ConnectionError if the content cannot be sent. Its messages are then not pending, so that it can be
+        sent again, but the messages pending before it still are.
+        """
+        with self.lock:
+            self.connect_unlocked()
+            messages = list(content_messages(content))
+            with self.pending_lock:
+                self.pending.extend(messages)
+            try:
+                self.write(content)
+                return
+            except OSError:
+                self.drop(self.connection)
+            try:
+                # The content is pending, so reconnecting sends it again after the messages pending before it.
+                self.connect_unlocked()
+            except ConnectionError:
+                unsent = {id(message) for message in messages}
+                with self.pending_lock:
+                    self.pending = deque(message for message in self.pending if id(message) not in unsent)
+                raise
+
+    def write(self, content: Union["osc_message.OscMessage", "osc_bundle.OscBundle"]) -> None:
+        """
+        Writes an OSC message or bundle to the open connection as one SLIP packet.
+
+        :param content: Message or bundle to write.
+        :raises: OSError if the connection is broken.
+        """
+        from pythonosc import slip
+
+        self.connection.sendall(slip.encode(content.dgram))
+
+    def read_replies(self, connection: socket.socket) -> None:
+        """
+        Reads the replies QLab sends on a connection until it is closed, and marks the messages they reply to
+        as no longer pending.
+
+        :param connection: Connection to read the replies from.
+        """
+        from pythonosc import osc_message, slip
+
+        buffer = b""
+        while True:
+            try:
+                chunk = connection.recv(RECEIVE_CHUNK_SIZE)
+            except OSError:
+                chunk = b""
+            if not chunk:
+                with self.lock:
+                    self.drop(connection)
+                return
+            buffer += chunk
+            # Everything up to the last END byte is complete packets, the rest is the start of the next packet.
+            packets, _, buffer = buffer.rpartition(slip.END)
+            for packet in packets.split(slip.END):
+                if not packet:
+                    continue
+                try:
+                    reply = osc_message.OscMessage(slip.decode(packet))
+                except (slip.ProtocolError, osc_message.ParseError):
+                    continue
+                with self.pending_lock:
+                    self.mark_replied(reply)
+
+    def mark_replied(self, reply: "osc_message.OscMessage") -> None:
+        """
+        Marks the oldest pending message a reply from QLab replies to as no longer pending.
+        Called with the pending lock held.
+        Other messages from QLab, such as updates, and replies to messages that are not pending are ignored.
+
+        :param reply: Message received from QLab.
+        :mutates: self.pending to remove the message replied to.
+        """
+        if not reply.address.startswith(REPLY_PREFIX + "/"):
+            return
+        addresses = {reply.address[len(REPLY_PREFIX):]}
+        # The reply also names the address it replies to in its JSON body, as it was sent.
+        try:
+            addresses.add(json.loads(reply.params[0])["address"])
+        except (IndexError, TypeError, ValueError, KeyError):
+            pass
+        for index, message in enumerate(self.pending):
+            if message.address in addresses:
+                del self.pending[index]
+                return
+
+    def drop(self, connection: Optional[socket.socket]) -> None:
+        """
+        Closes a connection that broke, so that the next send opens a new one. Called with the lock held.
+
+        :param connection: Connection to close, ignored if it is no longer the current one.
+        """
+        if connection is None or connection is not self.connection:
+            return
+        self.connection = None
+        connection.close()
+
+    def close(self) -> None:
+        """
+        Closes the connection once QLab has read every message sent on it: stops sending, then waits up to
+        the timeout for QLab to close its side, so that no message still in flight is cut off.
+        """
+        with self.lock:
+            connection, reader = self.connection, self.reader
+        if connection is None:
+            return
+        try:
+            connection.shutdown(socket.SHUT_WR)
+        except OSError:
+            pass
+        reader.join(self.timeout)
+        with self.lock:
+            self.drop(connection)
+
+def content_messages(content: Union["osc_message.OscMessage", "osc_bundle.OscBundle"]) -> Iterator["osc_message.OscMessage"]:
+    """
+    Iterates over the messages of an OSC message or bundle, including the ones of nested bundles, in order.
+
+    :param content: Message or bundle.
+    :return: Iterator over the messages.
+    """
+    from pythonosc import osc_bundle
+
+    if not isinstance(content, osc_bundle.OscBundle):
+        yield content
+        return
+    for element in content:
+        yield from content_messages(element)
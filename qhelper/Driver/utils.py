@@ -36,13 +36,21 @@ class CueType(StrEnum):
 CONNECTION_SUCCESS_MESSAGE = "You are connected to QLab. Host: {host}, Port: {port}"
 CONNECTION_FAILURE_MESSAGE = "Failed to connect to the server using port {port}."
 WRITE_ERROR_MESSAGE = "Failed to communicate with QLab. The command {command} with arguments {args} WAS NOT sent."
+BUNDLE_WRITE_ERROR_MESSAGE = ("Failed to communicate with QLab. The bundle of {count} commands starting with {command} "
+                              "WAS NOT sent.")
 READ_ERROR_MESSAGE = "Failed to receive the response from QLab. The previous command might not have been recorded."
+CONNECTION_LOST_MESSAGE = "The connection to QLab was lost and could not be restored."
 CONNECTION_NOT_ESTABLISHED_WARNING = "This method should not be called before the connection to QLab is established."
 
 EXIT_SUCCESS_MESSAGE = "Program run finished successfully. Your cues were written to your QLab workspace."
 EXIT_FAILURE_MESSAGE = ("Something went wrong during the execution of the program. "
                         "Your cues might have been written to the QLab workspace partially.")
 
+CHANGED_GROUPS_MESSAGE = "Groups changed since the file was last parsed: {groups}."
+
+SERVER_LISTENING_MESSAGE = "The parse server is listening on {path}."
+SERVER_ALREADY_RUNNING_MESSAGE = "Another parse server is already listening on {path}."
+
 WORKSPACE_NAME_PROMPT = "Please enter the name of the QLab workspace you would like to write cues to: "
 INVALID_WORKSPACE_NAME_PROMPT = "The workspace name must not be empty. Try again: "
 WORKSPACE_PASSCODE_PROMPT = "Please enter the passcode to your workspace. Press ENTER if no passcode is set: "
@@ -68,10 +76,21 @@ MAX_RESPONSE_TIME = 2.0
 # Maximum number of tries to send/receive a request/response
 MAX_NUM_TRIES = 3
 
+# Maximum size in bytes of a bundle of OSC messages sent in one UDP datagram.
+# Stays under the 1500 byte Ethernet MTU with room for the IP and UDP headers, so that bundles are never fragmented.
+MAX_BUNDLE_SIZE = 1400
+
+# Maximum size in bytes of a bundle of OSC messages sent over TCP, which splits and reassembles large bundles by itself.
+MAX_TCP_BUNDLE_SIZE = 64 * 1024
+
 # These are QLab application methods used to communicate with workspaces.
 CONNECT_TO_WORKSPACE = "/workspace/{id}/connect"
 DISCONNECT = "/disconnect"
+ALWAYS_REPLY = "/alwaysReply"
 SAVE_TO_DISK = "/workspace/{id}/save"
 CREATE_CUE = "/workspace/{id}/new"
 SET_CUE_NAME = "/cue/selected/name"
-SET_CUE_PREWAIT = "/cue/selected/preWait"
\ No newline at end of file
+SET_CUE_PREWAIT = "/cue/selected/preWait"
+
+# Prefix of the address of every reply QLab sends, followed by the address of the message it replies to.
+REPLY_PREFIX = "/reply"
\ No newline at end of file
@@ -0,0 +1,390 @@
+import datetime
+import html
+import posixpath
+import re
+import zipfile
+from array import array
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Collection, Dict, Iterator, List, Optional, Set, Tuple
+from xml.etree import ElementTree
+
+WORKBOOK_PART = "xl/workbook.xml"
+WORKBOOK_RELATIONSHIPS_PART = "xl/_rels/workbook.xml.rels"
+SHARED_STRINGS_PART = "xl/sharedStrings.xml"
+STYLES_PART = "xl/styles.xml"
+
+# Built-in number formats, by numFmtId, that display dates or times.
+BUILTIN_DATE_FORMATS = {
+    14: "mm-dd-yy", 15: "d-mmm-yy", 16: "d-mmm", 17: "mmm-yy", 18: "h:mm AM/PM", 19: "h:mm:ss AM/PM",
+    20: "h:mm", 21: "h:mm:ss", 22: "m/d/yy h:mm", 45: "mm:ss", 46: "[h]:mm:ss", 47: "mmss.0",
+}
+
+# Quoted text and bracketed sections other than elapsed hours, minutes or seconds do not make a number format a date format.
+NUMBER_FORMAT_LITERAL_PATTERN = re.compile(r'".*?"|\[(?!hh?\]|mm?\]|ss?\])[^\]]*\]')
+DATE_FORMAT_PATTERN = re.compile(r"(?<![_\\])[dmhysDMHYS]")
+TIMEDELTA_FORMAT_PATTERN = re.compile(r"\[hh?\](:mm(:ss(\.0*)?)?)?|\[mm?\](:ss(\.0*)?)?|\[ss?\](\.0*)?", re.IGNORECASE)
+
+# Patterns finding the parts of the raw shared strings XML, with or without a namespace prefix.
+STRING_ITEM_START_PATTERN = re.compile(rb"<(?:[\w.-]+:)?si[\s/>]")
+PHONETIC_RUN_PATTERN = re.compile(r"<((?:[\w.-]+:)?rPh)[\s>].*?</\1>", re.DOTALL)
+TEXT_ELEMENT_PATTERN = re.compile(r"<(?:[\w.-]+:)?t(?:\s[^>]*)?(?:/>|>(.*?)</(?:[\w.-]+:)?t>)", re.DOTALL)
+
+WINDOWS_EPOCH = datetime.datetime(1899, 12, 30)
+MAC_EPOCH = datetime.datetime(1904, 1, 1)
+SECONDS_PER_DAY = 24 * 60 * 60
+
+@lru_cache(maxsize=256)
+def local_name(tag: str) -> str:
+    """
+    Strips the namespace from an XML tag or attribute name, so that both transitional and strict xlsx files can be read.
+    Results are memoized, since a part only uses a handful of distinct tags.
+
+    :param tag: Tag or attribute name, possibly prefixed with a namespace in braces.
+    :return: Name without the namespace.
+    """
+    return tag.rsplit("}", 1)[-1]
+
+def sheet_parts(archive: zipfile.ZipFile) -> List[Tuple[str, str]]:
+    """
+    Finds the name and the part holding the cells of each sheet in an xlsx archive.
+
+    :param archive: Opened xlsx archive.
+    :return: Names of the sheets and paths of their parts in the archive, in the workbook order.
+    """
+    relationships = ElementTree.fromstring(archive.read(WORKBOOK_RELATIONSHIPS_PART))
+    targets = {relationship.get("Id"): relationship.get("Target") for relationship in relationships}
+
+    parts = []
+    for element in ElementTree.fromstring(archive.read(WORKBOOK_PART)).iter():
+        if local_name(element.tag) != "sheet":
+            continue
+        relationship_id = next(value for name, value in element.attrib.items() if local_name(name) == "id")
+        target = targets[relationship_id]
+        if target.startswith("/"):
+            part = target.lstrip("/")
+        else:
+            part = posixpath.normpath(posixpath.join(posixpath.dirname(WORKBOOK_PART), target))
+        parts.append((element.get("name"), part))
+    return parts
+
+def sheet_fingerprints(excel_file: str) -> Optional[Dict[str, str]]:
+    """
+    Computes a fingerprint of each sheet in an xlsx file from the CRCs and sizes recorded in the zip directory,
+    without decompressing anything but the workbook part.
+    A sheet's fingerprint also covers the shared strings and styles, since its cell values depend on them.
+
+    :param excel_file: Excel file path.
+    :return: Fingerprints keyed by sheet name in the workbook order, or None if the file is not an xlsx archive.
+    """
+    try:
+        with zipfile.ZipFile(excel_file) as archive:
+            members = {info.filename: f"{info.CRC:08x}:{info.file_size}" for info in archive.infolist()}
+            shared = ",".join(members.get(part, "") for part in (SHARED_STRINGS_PART, STYLES_PART))
+            return {sheet_name: f"{members.get(part, '')},{shared}" for sheet_name, part in sheet_parts(archive)}
+    except (zipfile.BadZipFile, KeyError, StopIteration, ElementTree.ParseError):
+        return None
+
+def column_index(reference: str) -> int:
+    """
+    Converts the column letters of a cell reference to a zero-based column index.
+
+    :param reference: Cell reference such as "AB12".
+    :return: Zero-based index of the column.
+    """
+    index = 0
+    for char in reference:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - ord("A") + 1
+    return index - 1
+
+def is_date_format(number_format: Optional[str]) -> bool:
+    """
+    Checks whether a number format displays numbers as dates or times.
+
+    :param number_format: Number format code.
+    :return: True if the format is a date or time format, False otherwise.
+    """
+    if number_format is None:
+        return False
+    number_format = NUMBER_FORMAT_LITERAL_PATTERN.sub("", number_format.split(";")[0])
+    return DATE_FORMAT_PATTERN.search(number_format) is not None
+
+def is_timedelta_format(number_format: Optional[str]) -> bool:
+    """
+    Checks whether a number format displays numbers as elapsed time.
+
+    :param number_format: Number format code.
+    :return: True if the format is an elapsed time format, False otherwise.
+    """
+    if number_format is None:
+        return False
+    return TIMEDELTA_FORMAT_PATTERN.search(number_format.split(";")[0]) is not None
+
+def from_excel(value: float, epoch: datetime.datetime, is_timedelta: bool) -> Any:
+    """
+    Converts an Excel serial date the way openpyxl does: fractions of a day become times, larger values become datetimes,
+    and values displayed as elapsed time become time deltas.
+
+    :param value: Serial date.
+    :param epoch: Day the serial dates of the workbook count from.
+    :param is_timedelta: Whether the value is displayed as elapsed time.
+    :return: Time, datetime or time delta the serial date represents.
+    :raises: ValueError or OverflowError if the value is outside the limits for dates.
+    """
+    if is_timedelta:
+        delta = datetime.timedelta(days=value)
+        if delta.microseconds:
+            delta = datetime.timedelta(seconds=delta.total_seconds() // 1, microseconds=round(delta.microseconds, -3))
+        return delta
+
+    day, fraction = divmod(value, 1)
+    difference = datetime.timedelta(milliseconds=round(fraction * SECONDS_PER_DAY * 1000))
+    if 0 <= value < 1 and difference.days == 0:
+        minutes, seconds = divmod(difference.seconds, 60)
+        hours, minutes = divmod(minutes, 60)
+        return datetime.time(hours, minutes, seconds, difference.microseconds)
+    # The Windows epoch accounts for Excel treating 1900 as a leap year, which only matters for the first 60 days.
+    if 0 < value < 60 and epoch == WINDOWS_EPOCH:
+        day += 1
+    return epoch + datetime.timedelta(days=day) + difference
+
+def read_epoch(archive: zipfile.ZipFile) -> datetime.datetime:
+    """
+    Finds the day the serial dates of a workbook count from.
+
+    :param archive: Opened xlsx archive.
+    :return: MAC_EPOCH if the workbook uses the 1904 date system, WINDOWS_EPOCH otherwise.
+    """
+    for element in ElementTree.fromstring(archive.read(WORKBOOK_PART)).iter():
+        if local_name(element.tag) == "workbookPr":
+            return MAC_EPOCH if element.get("date1904") in ("1", "true") else WINDOWS_EPOCH
+    return WINDOWS_EPOCH
+
+def read_date_styles(archive: zipfile.ZipFile) -> Tuple[Set[int], Set[int]]:
+    """
+    Finds the cell styles whose number format displays dates or times, and those displaying elapsed time.
+
+    :param archive: Opened xlsx archive.
+    :return: Indices of the date and time cell styles, and indices of the elapsed time cell styles.
+    """
+    date_styles = set()
+    timedelta_styles = set()
+    if STYLES_PART not in archive.namelist():
+        return date_styles, timedelta_styles
+
+    styles = ElementTree.fromstring(archive.read(STYLES_PART))
+    custom_formats = {int(element.get("numFmtId")): element.get("formatCode")
+                      for element in styles.iter() if local_name(element.tag) == "numFmt"}
+    for cell_formats in styles:
+        if local_name(cell_formats.tag) != "cellXfs":
+            continue
+        for style_index, cell_format in enumerate(cell_formats):
+            format_id = int(cell_format.get("numFmtId", 0))
+            number_format = custom_formats.get(format_id, BUILTIN_DATE_FORMATS.get(format_id))
+            if is_date_format(number_format):
+                date_styles.add(style_index)
+            if is_timedelta_format(number_format):
+                timedelta_styles.add(style_index)
+    return date_styles, timedelta_styles
+
+def string_item_text(element: ElementTree.Element) -> str:
+    """
+    Joins the text of a shared or inline string, leaving out phonetic hints.
+
+    :param element: String item element, with either one text element or several rich text runs.
+    :return: Text of the string.
+    """
+    snippets = []
+    for child in element:
+        if local_name(child.tag) == "t":
+            snippets.append(child.text or "")
+        elif local_name(child.tag) == "r":
+            snippets.extend(run_child.text or "" for run_child in child if local_name(run_child.tag) == "t")
+    return "".join(snippets)
+
+@dataclass(eq=False)
+class SharedStrings():
+    """
+    Shared strings table of a workbook that decodes each string only when it is needed.
+    The first pass only records where each string item starts in the raw part, so workbooks with many unique strings
+    do not hold a Python string for each of them. Decoded strings are cached.
+    """
+
+    data: bytes = b""
+    offsets: array = field(default_factory=lambda: array("q"))
+    decoded: Dict[int, str] = field(default_factory=dict)
+    matching: Dict[Any, Set[int]] = field(default_factory=dict)
+
+    @classmethod
+    def from_archive(cls, archive: zipfile.ZipFile) -> "SharedStrings":
+        """
+        Reads the shared strings part of an xlsx archive and indexes the offsets of its string items.
+
+        :param archive: Opened xlsx archive.
+        :return: Shared strings of the archive, empty if it has none.
+        """
+        if SHARED_STRINGS_PART not in archive.namelist():
+            return cls()
+
+        data = archive.read(SHARED_STRINGS_PART)
+        offsets = array("q", (match.start() for match in STRING_ITEM_START_PATTERN.finditer(data)))
+        end = data.rfind(b"</", offsets[-1] if offsets else 0)
+        # The last string item ends where the closing tag of the table starts.
+        offsets.append(end if end != -1 else len(data))
+        return cls(data, offsets)
+
+    def __len__(self) -> int:
+        return max(len(self.offsets) - 1, 0)
+
+    def __getitem__(self, index: int) -> str:
+        text = self.decoded.get(index)
+        if text is None:
+            text = self.decoded[index] = self.decode(index)
+        return text
+
+    def decode(self, index: int) -> str:
+        """
+        Decodes a string item without caching it, leaving out phonetic hints.
+
+        :param index: Index of the string in the table.
+        :return: Text of the string.
+        :raises: IndexError if there is no string with this index.
+        """
+        if not 0 <= index < len(self):
+            raise IndexError(f"No shared string with index {index}.")
+        item = self.data[self.offsets[index]:self.offsets[index + 1]].decode("utf-8")
+        item = PHONETIC_RUN_PATTERN.sub("", item).replace("\r\n", "\n").replace("\r", "\n")
+        text = "".join(html.unescape(snippet) for snippet in TEXT_ELEMENT_PATTERN.findall(item))
+        return text.replace("x005F_", "")
+
+    def indices_matching(self, key: Any, predicate: Callable[[str], bool]) -> Set[int]:
+        """
+        Finds the indices of all strings satisfying a predicate, decoding every string once without caching it.
+        The result is remembered under the given key, so that the same lookup by any sheet of the workbook is free.
+
+        :param key: Hashable key identifying the predicate.
+        :param predicate: Function called with the text of each string.
+        :return: Indices of the strings the predicate returned True for.
+        """
+        if key not in self.matching:
+            self.matching[key] = {index for index in range(len(self)) if predicate(self.decode(index))}
+        return self.matching[key]
+
+@dataclass(eq=False, slots=True)
+class SharedString():
+    """
+    Cell value referencing a string of the shared strings table, converted to the text with str() only when needed.
+    """
+
+    strings: SharedStrings
+    index: int
+
+    def __str__(self) -> str:
+        return self.strings[self.index]
+
+@dataclass
+class SheetReader():
+    """
+    Converts the cell elements of the sheets of one xlsx archive to the values pandas reads for them.
+    """
+
+    shared_strings: SharedStrings
+    date_styles: Set[int]
+    timedelta_styles: Set[int]
+    epoch: datetime.datetime
+
+    def cell_value(self, cell: ElementTree.Element) -> Any:
+        """
+        Converts a cell element to its value.
+
+        :param cell: Cell element.
+        :return: Value of the cell, or None if the cell is blank or holds an error.
+        """
+        data_type = cell.get("t", "n")
+        value = None
+        for child in cell:
+            if data_type == "inlineStr" and local_name(child.tag) == "is":
+                return string_item_text(child)
+            if local_name(child.tag) == "v":
+                value = child.text
+        if not value:
+            return None
+
+        if data_type == "n":
+            number = float(value) if "." in value or "e" in value or "E" in value else int(value)
+            style = int(cell.get("s", 0))
+            if style in self.date_styles:
+                try:
+                    return from_excel(number, self.epoch, style in self.timedelta_styles)
+                except (OverflowError, ValueError):
+                    return None
+            if isinstance(number, float) and number.is_integer():
+                return int(number)
+            return number
+        if data_type == "s":
+            return SharedString(self.shared_strings, int(value))
+        if data_type == "b":
+            return bool(int(value))
+        if data_type == "str":
+            return value
+        if data_type == "d":
+            try:
+                return datetime.datetime.fromisoformat(value)
+            except ValueError:
+                return value
+        return None
+
+    def iter_rows(self, source: Any) -> Iterator[Tuple[Any, ...]]:
+        """
+        Streams the rows of a sheet part, discarding every row element once it is converted.
+        Rows missing from the part are yielded as empty rows, so that row numbers match the sheet.
+
+        :param source: Opened sheet part.
+        :return: Iterator over the rows of the sheet as tuples of cell values.
+        """
+        row_num = 0
+        sheet_data = None
+        for event, element in ElementTree.iterparse(source, events=("start", "end")):
+            tag = local_name(element.tag)
+            if event == "start":
+                if tag == "sheetData":
+                    sheet_data = element
+                continue
+            if tag != "row":
+                continue
+
+            target_row_num = int(element.get("r", row_num + 1))
+            while row_num + 1 < target_row_num:
+                row_num += 1
+                yield ()
+            row_num = target_row_num
+
+            values = []
+            for cell in element:
+                reference = cell.get("r")
+                if reference:
+                    values.extend([None] * (column_index(reference) - len(values)))
+                values.append(self.cell_value(cell))
+            yield tuple(values)
+
+            if sheet_data is not None:
+                sheet_data.clear()
+
+def stream_xlsx_sheets(excel_file: str, sheet_names: Optional[Collection[str]] = None) -> Iterator[Tuple[str, Iterator[Tuple[Any, ...]]]]:
+    """
+    Streams each sheet in an xlsx file row by row using only the standard library.
+    Rows are only read from the file as they are consumed, so each sheet must be consumed before moving on to the next one.
+
+    :param excel_file: Excel file path.
+    :param sheet_names: Names of the sheets to stream, or None to stream all sheets.
+    :return: Iterator over sheet names and lazy iterators over the rows of each sheet, in the workbook order.
+    """
+    with zipfile.ZipFile(excel_file) as archive:
+        reader = SheetReader(SharedStrings.from_archive(archive), *read_date_styles(archive), read_epoch(archive))
+        for sheet_name, part in sheet_parts(archive):
+            if sheet_names is not None and sheet_name not in sheet_names:
+                continue
+            with archive.open(part) as source:
+                yield sheet_name, reader.iter_rows(source)